@@ -0,0 +1,101 @@
+"""Micro-benchmark of starboard database operations before and after the WAL access layer.
+
+Run from the repository root:
+    python benchmarks/database_ops.py --ops 2000
+
+"before" replays the old pattern (a new rollback-journal connection per call
+on the calling thread); "after" goes through database.py's long-lived WAL
+connection on its dedicated thread. Both use throwaway database files.
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+
+def before_ops(path, n):
+    def connect():
+        return sqlite3.connect(path)
+
+    with connect() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS starboard (message_id INTEGER PRIMARY KEY, star_message_id INTEGER, embed_message_id INTEGER, channel_id INTEGER, guild_id INTEGER, author_id INTEGER, reaction_count INTEGER)")
+    results = {}
+
+    start = time.perf_counter()
+    for i in range(n):
+        with connect() as conn:
+            conn.execute("INSERT INTO starboard (message_id, star_message_id, embed_message_id, channel_id, guild_id, author_id, reaction_count) VALUES (?, ?, ?, ?, ?, ?, ?)", (i, i, i, 1, 1, 1, 4))
+            conn.commit()
+    results["insert"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        with connect() as conn:
+            conn.execute("SELECT * FROM starboard WHERE message_id = ?", (i,)).fetchone()
+    results["get"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        with connect() as conn:
+            conn.execute("UPDATE starboard SET reaction_count = ? WHERE message_id = ?", (5, i))
+            conn.commit()
+    results["update"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        with connect() as conn:
+            conn.execute("DELETE FROM starboard WHERE message_id = ?", (i,))
+            conn.commit()
+    results["remove"] = time.perf_counter() - start
+    return results
+
+async def after_ops(path, n):
+    database.DB_PATH = path
+    await database.create_tables()
+    results = {}
+
+    start = time.perf_counter()
+    for i in range(n):
+        await database.add_starred_message(i, i, i, 1, 1, 1, 4)
+    results["insert"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        await database.get_starred_message(i)
+    results["get"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        await database.update_reaction_count(i, 5)
+    results["update"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        await database.remove_starred_message(i)
+    results["remove"] = time.perf_counter() - start
+
+    await database.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = before_ops(os.path.join(tmp, "before.db"), args.ops)
+        after = asyncio.run(after_ops(os.path.join(tmp, "after.db"), args.ops))
+
+    print(f"{'op':<8}{'before ops/s':>14}{'after ops/s':>14}{'speedup':>10}")
+    for op in before:
+        b = args.ops / before[op]
+        a = args.ops / after[op]
+        print(f"{op:<8}{b:>14.0f}{a:>14.0f}{a / b:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
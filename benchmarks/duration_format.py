@@ -0,0 +1,128 @@
+"""Check duration.py against a reference implementation, then time it against the old format_time.
+
+Run from the repository root:
+    python benchmarks/duration_format.py --cases 20000
+
+The check generates random millisecond values, renders them as every
+ISO-8601 shape speedrun.com uses (with and without hours, minutes and
+fractions of 1-3 digits) and asserts that parse_ms and format_ms agree with
+a straightforward Decimal-based reference.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import duration
+
+def to_iso(ms, rng):
+    """Render milliseconds as a randomly shaped but equivalent ISO-8601 duration"""
+    hours, rest = divmod(ms, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    seconds, millis = divmod(rest, 1000)
+    text = "PT"
+    if hours or rng.random() < 0.1:
+        text += f"{hours}H"
+    if minutes or (hours and rng.random() < 0.5):
+        text += f"{minutes}M"
+    if millis:
+        fraction = f"{millis:03d}"
+        # Trailing zeros are optional (".6" == ".600")
+        text += f"{seconds}.{fraction.rstrip('0') if rng.random() < 0.7 else fraction}S"
+    elif seconds or text == "PT" or rng.random() < 0.5:
+        text += f"{seconds}S"
+    return text
+
+def reference_parse(text):
+    body = text[2:]
+    total = Decimal(0)
+    for unit, scale in (("H", 3600), ("M", 60), ("S", 1)):
+        if unit in body:
+            value, body = body.split(unit, 1)
+            total += Decimal(value) * scale
+    return int(total * 1000)
+
+def reference_format(ms):
+    hours, rest = divmod(ms, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    seconds = Decimal(rest) / 1000
+    if hours:
+        return f"{hours}h {minutes}m {seconds:.3f}s"
+    if minutes:
+        return f"{minutes}m {seconds:.3f}s"
+    return f"{seconds:.3f}s"
+
+def old_format_time(run_time):
+    """format_time as it was in main.py, kept for timing only"""
+    if not run_time:
+        return "Time not available"
+    time_str = run_time.replace("PT", "")
+    hours = minutes = seconds = milliseconds = 0
+    if "H" in time_str:
+        h_split = time_str.split("H")
+        hours = int(h_split[0])
+        time_str = h_split[1]
+    if "M" in time_str:
+        m_split = time_str.split("M")
+        minutes = int(m_split[0])
+        time_str = m_split[1]
+    if "S" in time_str:
+        s_split = time_str.split("S")[0]
+        if "." in s_split:
+            s_parts = s_split.split(".")
+            seconds = int(s_parts[0])
+            milliseconds = int(s_parts[1])
+        else:
+            seconds = int(s_split)
+    if hours > 0:
+        return f"{hours}h {minutes}m {seconds}.{milliseconds:03d}s"
+    elif minutes > 0:
+        return f"{minutes}m {seconds}.{milliseconds:03d}s"
+    else:
+        return f"{seconds}.{milliseconds:03d}s"
+
+def check(cases, rng):
+    samples = []
+    for _ in range(cases):
+        # Mix short IL times with multi-hour full-game runs
+        ms = rng.randrange(0, 60000) if rng.random() < 0.5 else rng.randrange(0, 30 * 3600000)
+        text = to_iso(ms, rng)
+        assert reference_parse(text) == ms, text
+        assert duration.parse_ms(text) == ms, (text, duration.parse_ms(text), ms)
+        assert duration.format_duration(text) == reference_format(ms), (text, duration.format_duration(text))
+        samples.append(text)
+    return samples
+
+def timed(name, fn, samples, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(samples)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22}{len(samples) * repeat / elapsed:>14,.0f} durations/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    samples = check(args.cases, rng)
+    print(f"{args.cases} random durations match the reference")
+
+    # PB lists repeat a small set of times, so sample from a pool the cache can hold
+    pool = samples[:1000]
+    workload = [rng.choice(pool) for _ in range(args.cases)]
+    duration.parse_ms.cache_clear()
+    duration.format_ms.cache_clear()
+    timed("old format_time", lambda texts: [old_format_time(t) for t in texts], workload, args.repeat)
+    timed("uncached parse+format", lambda texts: [duration.format_ms.__wrapped__(duration.parse_ms.__wrapped__(t)) for t in texts], workload, args.repeat)
+    timed("cached parse+format", lambda texts: [duration.format_duration(t) for t in texts], workload, args.repeat)
+    timed("format_many (cached)", lambda texts: duration.format_many([duration.parse_ms(t) for t in texts]), workload, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Serve canned speedrun.com responses from benchmarks/fixtures on a local port.
+
+Run from the repository root:
+    python benchmarks/fake_srcom.py --port 8765 --latency 80
+    SRCOM_API_BASE=http://127.0.0.1:8765/api/v1 python main.py
+
+Every `users?lookup=` name resolves to a user (the fixture user, renamed and
+with an id derived from the name), and every user has the fixture PBs, so a
+load test can spread requests over as many players as it likes. Responses
+carry an ETag and answer If-None-Match with 304 like the real API.
+`--latency` adds a fixed delay with up to 50% jitter to every response.
+
+The fixtures follow the API's response shapes (personal-bests with
+embed=game,category,level); a saved real response can replace any of them.
+"""
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import random
+from collections import Counter
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# === Global Variables ===
+requests_served = Counter()  # route -> responses sent, including 304s
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+def user_id_for(name):
+    return hashlib.sha1(name.lower().encode()).hexdigest()[:8]
+
+class FakeSpeedrunCom:
+    def __init__(self, latency=0.0, seed=0):
+        self.latency = latency  # seconds
+        self.rng = random.Random(seed)
+        # Serialized once; every response is a bytes copy plus an ETag comparison
+        self.bodies = {name: self._encode(load_fixture(name)) for name in ("runs", "personal-bests", "games", "categories", "leaderboards")}
+        self.users = load_fixture("users")
+        game = load_fixture("games")
+        # The name search answers with a list; every name finds the fixture game
+        self.bodies["game-search"] = self._encode({"data": [game["data"]], "pagination": {"offset": 0, "max": 10, "size": 1, "links": []}})
+        self.runner = None
+
+    @staticmethod
+    def _encode(data):
+        body = json.dumps(data, separators=(",", ":")).encode()
+        return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+    async def _respond(self, request, route, encoded):
+        requests_served[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * (1 + self.rng.random() * 0.5))
+        body, etag = encoded
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="application/json", headers={"ETag": etag})
+
+    async def users_lookup(self, request):
+        name = request.query.get("lookup", "")
+        data = copy.deepcopy(self.users)
+        if name:
+            data["data"][0]["id"] = user_id_for(name)
+            data["data"][0]["names"]["international"] = name
+        return await self._respond(request, "users", self._encode(data))
+
+    async def personal_bests(self, request):
+        return await self._respond(request, "users/{id}/personal-bests", self.bodies["personal-bests"])
+
+    async def runs(self, request):
+        return await self._respond(request, "runs", self.bodies["runs"])
+
+    async def game(self, request):
+        return await self._respond(request, "games/{id}", self.bodies["games"])
+
+    async def game_search(self, request):
+        return await self._respond(request, "games", self.bodies["game-search"])
+
+    async def categories(self, request):
+        return await self._respond(request, "games/{id}/categories", self.bodies["categories"])
+
+    async def leaderboard(self, request):
+        return await self._respond(request, "leaderboards/{game}/category/{category}", self.bodies["leaderboards"])
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/api/v1/users", self.users_lookup)
+        app.router.add_get("/api/v1/users/{user_id}/personal-bests", self.personal_bests)
+        app.router.add_get("/api/v1/runs", self.runs)
+        app.router.add_get("/api/v1/games", self.game_search)
+        app.router.add_get("/api/v1/games/{game}", self.game)
+        app.router.add_get("/api/v1/games/{game}/categories", self.categories)
+        app.router.add_get("/api/v1/leaderboards/{game}/category/{category}", self.leaderboard)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving and return the API base URL to point srcom at"""
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/api/v1"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds added to every response")
+    args = parser.parse_args()
+
+    server = FakeSpeedrunCom(latency=args.latency / 1000)
+    base = await server.start(args.host, args.port)
+    print(f"Serving fixtures at {base}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
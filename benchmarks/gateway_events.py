@@ -0,0 +1,358 @@
+"""Replay synthetic gateway events through the bot against fake Discord and speedrun.com backends.
+
+Run from the repository root:
+    python benchmarks/gateway_events.py --events 5000 --messages 300 --latency 50
+
+Events go through discord.py's own gateway parsers (MESSAGE_CREATE,
+MESSAGE_REACTION_ADD/REMOVE, MESSAGE_DELETE, INTERACTION_CREATE), so the
+numbers include parsing, the client message cache, the starboard handlers and
+the PB and leaderboard slash commands. Discord's REST layer is replaced by an in-process fake
+that answers instantly and counts calls per route; speedrun.com is
+benchmarks/fake_srcom.py replaying the fixtures with `--latency` ms
+of delay. The database is a throwaway file.
+
+Reported per event type: events/sec, p50/p99 latency from the gateway
+payload to the handler finishing, and Discord REST and speedrun.com calls per
+event. "reaction (applied)" is the latency until the debounced board update
+covering a reaction has been written.
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import discord
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import database
+import fake_srcom
+import main
+import metrics
+import srcom
+import starboard
+
+GUILD_ID = 1000
+CHANNEL_ID = 1001
+BOARD_CHANNEL_ID = 1002
+EMOJI_ID = 1003
+BOT_ID = 1004
+APPLICATION_ID = 1005
+USERS = 500  # distinct reacting/posting users
+PLAYERS = ["PlayfulMathematician", "Appel", "speedy", "glitchless", "framePerfect", "wr_holder"]
+# Share of each event type in the synthetic stream
+MIX = {"reaction_add": 0.55, "reaction_remove": 0.15, "message": 0.2, "delete": 0.04, "command": 0.06}
+
+_ids = itertools.count(discord.utils.time_snowflake(datetime.now(timezone.utc)))
+# The event type whose handlers are running; tasks inherit it, so REST calls are charged to the event that caused them.
+# Board updates run on the starboard workers, which were started before any event, and show up as "starboard worker".
+current_event = contextvars.ContextVar("current_event", default="starboard worker")
+
+def user_payload(user_id, bot=False):
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "global_name": None, "avatar": None, "bot": bot}
+
+def message_payload(message_id, channel_id, author, content="", reactions=()):
+    return {
+        "id": str(message_id), "channel_id": str(channel_id), "guild_id": str(GUILD_ID), "author": author,
+        "content": content, "timestamp": datetime.now(timezone.utc).isoformat(), "edited_timestamp": None,
+        "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+        "embeds": [], "pinned": False, "type": 0, "flags": 0, "reactions": list(reactions)
+    }
+
+def guild_payload():
+    channel = lambda channel_id, name, position: {"id": str(channel_id), "type": 0, "name": name, "position": position, "guild_id": str(GUILD_ID), "permission_overwrites": []}
+    return {
+        "id": str(GUILD_ID), "name": "Benchmark", "owner_id": "1", "member_count": USERS, "large": True, "features": [],
+        "channels": [channel(CHANNEL_ID, "general", 0), channel(BOARD_CHANNEL_ID, "appelboard", 1)],
+        "roles": [{"id": str(GUILD_ID), "name": "@everyone", "permissions": "104324673", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "emojis": [{"id": str(EMOJI_ID), "name": "appel", "animated": False, "available": True,
+                    "require_colons": True, "managed": False, "roles": []}],
+        "members": [], "threads": [], "stickers": []
+    }
+
+class FakeDiscordHTTP:
+    """Stands in for discord.py's REST calls: answers instantly and counts requests per route"""
+
+    def __init__(self, reaction_counts):
+        self.calls = Counter()
+        self.calls_by_event = Counter()
+        self.reaction_counts = reaction_counts  # message_id -> appel reactions, for fetch_message
+        self.bot_user = user_payload(BOT_ID, bot=True)
+
+    def _message(self, route, payload, channel_id):
+        message_id = int(route.url.rstrip("/").rsplit("/", 1)[1]) if route.method == "PATCH" else next(_ids)
+        content = (payload or {}).get("content") or ""
+        return message_payload(message_id, channel_id, self.bot_user, content)
+
+    def _count(self, route):
+        self.calls[f"{route.method} {route.path}"] += 1
+        self.calls_by_event[current_event.get()] += 1
+
+    async def request(self, route, **kwargs):
+        self._count(route)
+        if route.path == "/channels/{channel_id}/messages/{message_id}" and route.method == "GET":
+            message_id = int(route.url.rsplit("/", 1)[1])
+            count = self.reaction_counts.get(message_id, 0)
+            reactions = [{"emoji": {"id": str(EMOJI_ID), "name": "appel"}, "count": count, "me": False}] if count else []
+            return message_payload(message_id, route.channel_id, user_payload(2000), "fetched", reactions)
+        if route.path.startswith("/channels/{channel_id}/messages") and route.method in ("POST", "PATCH") and "reactions" not in route.path:
+            return self._message(route, kwargs.get("json"), route.channel_id)
+        return None
+
+    async def webhook_request(self, route, payload):
+        self._count(route)
+        if route.path.endswith("/callback"):
+            interaction_id = route.url.split("/interactions/", 1)[1].split("/", 1)[0]
+            return {"interaction": {"id": interaction_id, "type": 2}}
+        if route.method in ("POST", "PATCH"):
+            data = self._message(route, payload, CHANNEL_ID)
+            data["webhook_id"] = str(APPLICATION_ID)
+            return data
+        return None
+
+class FakeWebhookAdapter(discord.webhook.async_.AsyncWebhookAdapter):
+    """Interaction responses and follow-ups go through the webhook adapter rather than bot.http"""
+
+    def __init__(self, http):
+        super().__init__()
+        self.http = http
+
+    async def request(self, route, session, *, payload=None, **kwargs):
+        return await self.http.webhook_request(route, payload)
+
+class Workload:
+    def __init__(self, args):
+        self.rng = random.Random(args.seed)
+        self.args = args
+        self.messages = []  # ids of messages that still exist
+        self.reactors = defaultdict(set)  # message_id -> user ids with an appel on it
+        self.reaction_counts = {}
+        self.http = FakeDiscordHTTP(self.reaction_counts)
+        self.latencies = defaultdict(list)
+        self.srcom_calls = Counter()
+        self.counts = Counter()
+        self.reaction_times = defaultdict(list)  # message_id -> start times of reactions awaiting a flush
+        self._scheduled = None
+        self._commands = {}
+
+    # === Setup ===
+    async def setup(self, api_base):
+        bot = main.bot
+        state = bot._connection
+        await bot._async_setup_hook()
+        bot.http.request = self.http.request
+        discord.webhook.async_.async_context.set(FakeWebhookAdapter(self.http))
+        state.user = discord.ClientUser(state=state, data=user_payload(BOT_ID, bot=True))
+        state.application_id = APPLICATION_ID
+        srcom.API_BASE = api_base
+        main.METRICS_PORT = 0
+        await bot.setup_hook()
+        state._add_guild_from_data(guild_payload())
+        main.appel_emoji = discord.utils.get(bot.emojis, name="appel")
+
+        # Capture the handler tasks each parsed event schedules so they can be awaited
+        schedule = bot._schedule_event
+
+        def capture(coro, event_name, *args, **kwargs):
+            task = schedule(coro, event_name, *args, **kwargs)
+            if self._scheduled is not None:
+                self._scheduled.append(task)
+            return task
+        bot._schedule_event = capture
+
+        # Slash commands run on a task the tree creates itself; resolve a future when each finishes
+        call = bot.tree._call
+
+        async def timed_call(interaction):
+            try:
+                await call(interaction)
+            finally:
+                future = self._commands.pop(interaction.id, None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+        bot.tree._call = timed_call
+
+        send_request = srcom._send_request
+
+        async def counted_request(*args):
+            self.srcom_calls[current_event.get()] += 1
+            return await send_request(*args)
+        srcom._send_request = counted_request
+
+        flush_handler = main.flush_star_board
+
+        async def timed_flush(channel_id, message_id, update):
+            await flush_handler(channel_id, message_id, update)
+            done = time.perf_counter()
+            self.latencies["reaction (applied)"].extend(done - start for start in self.reaction_times.pop(message_id, ()))
+        starboard.set_flush_handler(timed_flush)
+
+        for _ in range(self.args.messages):
+            await self.dispatch("message", "MESSAGE_CREATE", self.new_message())
+        self.latencies.clear()
+        self.counts.clear()
+        self.http.calls.clear()
+        self.http.calls_by_event.clear()
+
+    def new_message(self):
+        message_id = next(_ids)
+        self.messages.append(message_id)
+        author = user_payload(self.rng.randrange(USERS) + 10)
+        content = f"<@{BOT_ID}> hi" if self.rng.random() < 0.05 else "message text"
+        data = message_payload(message_id, CHANNEL_ID, author, content)
+        if "<@" in content:
+            data["mentions"] = [user_payload(BOT_ID, bot=True)]
+        return data
+
+    # === Events ===
+    def next_event(self):
+        kind = self.rng.choices(list(MIX), weights=list(MIX.values()))[0]
+        # Reactions cluster on a few popular messages, like real boards
+        message_id = self.messages[min(len(self.messages) - 1, int(self.rng.expovariate(1 / 20)))] if self.messages else None
+        if kind == "reaction_add" and message_id:
+            user_id = self.rng.randrange(USERS) + 10
+            if user_id not in self.reactors[message_id]:
+                self.reactors[message_id].add(user_id)
+                self.reaction_counts[message_id] = len(self.reactors[message_id])
+                return kind, "MESSAGE_REACTION_ADD", {
+                    "user_id": str(user_id), "channel_id": str(CHANNEL_ID), "message_id": str(message_id),
+                    "guild_id": str(GUILD_ID), "emoji": {"id": str(EMOJI_ID), "name": "appel"}, "burst": False, "type": 0,
+                    "message_author_id": "2000",
+                    "member": {"user": user_payload(user_id), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+                }
+        if kind == "reaction_remove" and message_id and self.reactors[message_id]:
+            user_id = self.reactors[message_id].pop()
+            self.reaction_counts[message_id] = len(self.reactors[message_id])
+            return kind, "MESSAGE_REACTION_REMOVE", {
+                "user_id": str(user_id), "channel_id": str(CHANNEL_ID), "message_id": str(message_id),
+                "guild_id": str(GUILD_ID), "emoji": {"id": str(EMOJI_ID), "name": "appel"}, "burst": False, "type": 0
+            }
+        if kind == "delete" and message_id:
+            self.messages.remove(message_id)
+            self.reactors.pop(message_id, None)
+            self.reaction_counts.pop(message_id, None)
+            return kind, "MESSAGE_DELETE", {"id": str(message_id), "channel_id": str(CHANNEL_ID), "guild_id": str(GUILD_ID)}
+        if kind == "command":
+            return kind, "INTERACTION_CREATE", self.interaction()
+        return "message", "MESSAGE_CREATE", self.new_message()
+
+    def interaction(self):
+        player = self.rng.choice(PLAYERS)
+        name, options = self.rng.choice([
+            ("pbs", [{"name": "player", "type": 3, "value": player}]),
+            ("pbs", [{"name": "player", "type": 3, "value": player}, {"name": "game", "type": 3, "value": "mario"}]),
+            ("getallpbs", [{"name": "player", "type": 3, "value": player}, {"name": "game", "type": 3, "value": "a"}]),
+            ("pbsummary", [{"name": "player", "type": 3, "value": player}]),
+            ("leaderboard", [{"name": "game", "type": 3, "value": "Appel"}, {"name": "category", "type": 3, "value": "any"}])
+        ])
+        user_id = self.rng.randrange(USERS) + 10
+        return {
+            "id": str(next(_ids)), "application_id": str(APPLICATION_ID), "type": 2, "token": "benchmark", "version": 1,
+            "guild_id": str(GUILD_ID), "channel_id": str(CHANNEL_ID), "app_permissions": "104324673",
+            "attachment_size_limit": 8 * 1024 * 1024, "locale": "en-US", "entitlements": [],
+            "channel": {"id": str(CHANNEL_ID), "type": 0, "name": "general", "guild_id": str(GUILD_ID), "position": 0},
+            "member": {"user": user_payload(user_id), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00",
+                       "deaf": False, "mute": False, "flags": 0, "permissions": "104324673"},
+            "data": {"id": "1", "name": name, "type": 1, "options": options}
+        }
+
+    async def dispatch(self, kind, event, data):
+        """Parse one gateway payload and wait for every handler it triggered"""
+        current_event.set(kind)
+        start = time.perf_counter()
+        future = None
+        if event == "INTERACTION_CREATE":
+            future = self._commands[int(data["id"])] = asyncio.get_running_loop().create_future()
+        if event == "MESSAGE_REACTION_ADD" or event == "MESSAGE_REACTION_REMOVE":
+            self.reaction_times[int(data["message_id"])].append(start)
+        self._scheduled = scheduled = []
+        main.bot._connection.parsers[event](data)
+        self._scheduled = None
+        await asyncio.gather(*scheduled)
+        if future is not None:
+            await future
+        self.latencies[kind].append(time.perf_counter() - start)
+        self.counts[kind] += 1
+
+    async def run(self):
+        interval = 1 / self.args.rate if self.args.rate else 0
+        tasks = []
+        start = time.perf_counter()
+        for i in range(self.args.events):
+            kind, event, data = self.next_event()
+            tasks.append(asyncio.create_task(self.dispatch(kind, event, data)))
+            if interval:
+                await asyncio.sleep(max(0.0, start + (i + 1) * interval - time.perf_counter()))
+            elif i % 50 == 49:
+                # Let handlers run between bursts instead of queueing every event first
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        await starboard.flush_all()
+        return time.perf_counter() - start
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def report(workload, wall):
+    total = sum(workload.counts.values())
+    rest = workload.http.calls_by_event
+    print(f"{total} events in {wall:.2f}s: {total / wall:,.0f} events/s, "
+          f"{sum(rest.values()) / total:.3f} Discord REST calls/event, "
+          f"{sum(workload.srcom_calls.values()) / total:.3f} speedrun.com calls/event")
+    print(f"{'event':<20}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'REST/ev':>9}{'srcom/ev':>9}")
+    for kind, samples in sorted(workload.latencies.items()):
+        count = workload.counts[kind]
+        calls = f"{rest[kind] / count:>9.3f}{workload.srcom_calls[kind] / count:>9.3f}" if count else ""
+        print(f"{kind:<20}{len(samples):>7}{percentile(samples, 50) * 1000:>10.2f}{percentile(samples, 99) * 1000:>10.2f}"
+              f"{statistics.mean(samples) * 1000:>10.2f}{calls}")
+    print(f"{'starboard worker':<57}{rest['starboard worker'] / total:>9.3f}{workload.srcom_calls['starboard worker'] / total:>9.3f}")
+    print("Discord REST calls by route:")
+    for route, count in workload.http.calls.most_common():
+        print(f"  {count:>7}  {route}")
+    print(f"speedrun.com requests served: {dict(fake_srcom.requests_served)}")
+    errors = {f"{name}:{dict(labels).get('event') or dict(labels).get('command')}": value
+              for (name, labels), value in metrics.counters.items() if name in ("event_errors_total", "command_errors_total")}
+    if errors or starboard.queue_stats["errors"]:
+        print(f"Handler errors: {errors}, starboard job errors: {starboard.queue_stats['errors']}")
+
+async def main_async(args):
+    server = fake_srcom.FakeSpeedrunCom(latency=args.latency / 1000, seed=args.seed)
+    api_base = await server.start()
+    workload = Workload(args)
+    starboard.FLUSH_DELAY = args.flush_delay / 1000
+    try:
+        await workload.setup(api_base)
+        wall = await workload.run()
+        report(workload, wall)
+    finally:
+        await starboard.stop_workers()
+        await srcom.close_session()
+        await server.stop()
+        await database.close()
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=300, help="messages posted before the run starts")
+    parser.add_argument("--rate", type=float, default=0, help="events per second to offer; 0 sends as fast as possible")
+    parser.add_argument("--latency", type=float, default=50, help="speedrun.com response time in milliseconds")
+    parser.add_argument("--flush-delay", type=float, default=50, help="starboard debounce in milliseconds (the bot uses 2000)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "starboard.db")
+        asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    run()
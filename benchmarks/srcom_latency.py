@@ -0,0 +1,105 @@
+"""Compare the blocking requests.Session path against the async srcom client.
+
+Run from the repository root:
+    python benchmarks/srcom_latency.py --player PlayfulMathematician --rounds 10
+
+--player takes a comma-separated list; call i uses name i modulo its length.
+srcom's caches are cleared before every async call so each one goes to the
+network, but concurrent calls for the same name still share one request.
+
+For every path it reports per-call latency (p50/p99), wall time for a burst of
+concurrent calls and the worst event loop stall seen by a 10 ms ticker task,
+which is what gateway heartbeats would have experienced.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import srcom
+
+TICK = 0.01
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def report(name, latencies, wall, stall):
+    print(f"{name:<10} p50={percentile(latencies, 50) * 1000:8.1f}ms  p99={percentile(latencies, 99) * 1000:8.1f}ms  "
+          f"mean={statistics.mean(latencies) * 1000:8.1f}ms  wall={wall * 1000:8.1f}ms  max loop stall={stall * 1000:8.1f}ms")
+
+async def ticker(stop, stalls):
+    """Sleep in short ticks and record how late each wake-up was"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(TICK)
+        stalls.append(loop.time() - start - TICK)
+
+def blocking_pbs(session, player):
+    """The pre-srcom code path: two synchronous round trips"""
+    user = session.get(f"{srcom.API_BASE}/users", params={"lookup": player}, timeout=5).json()["data"][0]
+    session.get(f"{srcom.API_BASE}/users/{user['id']}/personal-bests", params={"embed": "game,category,level"}, timeout=5).json()
+
+def clear_caches():
+    for cache in (srcom.user_cache, srcom.pbs_cache, srcom.validator_cache):
+        cache.clear()
+
+async def run_blocking(players, rounds):
+    session = requests.Session()
+
+    async def one(player):
+        start = time.perf_counter()
+        blocking_pbs(session, player)
+        return time.perf_counter() - start
+
+    return await measure(one, players, rounds)
+
+async def run_async(players, rounds):
+    async def one(player):
+        # A cache hit would time a dict lookup, not a request
+        clear_caches()
+        start = time.perf_counter()
+        _, error = await srcom.fetch_player_pbs(player)
+        if error:
+            raise RuntimeError(error)
+        return time.perf_counter() - start
+
+    try:
+        return await measure(one, players, rounds)
+    finally:
+        await srcom.close_session()
+
+async def measure(one, players, rounds):
+    stop = asyncio.Event()
+    stalls = []
+    tick_task = asyncio.create_task(ticker(stop, stalls))
+    # Warm up DNS and the connection pool before timing
+    await one(players[0])
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(players[i % len(players)]) for i in range(rounds)))
+    wall = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    return latencies, wall, max(stalls, default=0.0)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--player", default="PlayfulMathematician")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--base-url", default=srcom.API_BASE)
+    args = parser.parse_args()
+    srcom.API_BASE = args.base_url.rstrip("/")
+
+    players = [name.strip() for name in args.player.split(",") if name.strip()]
+
+    report("blocking", *await run_blocking(players, args.rounds))
+    report("async", *await run_async(players, args.rounds))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,174 @@
+import asyncio
+import functools
 import sqlite3
+import time
+import metrics
+from concurrent.futures import ThreadPoolExecutor
 
 DB_PATH = "starboard.db"
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Discord snowflake -> days since the Unix epoch
+DAY_OF_MESSAGE = "((({0} >> 22) + 1420070400000) / 86400000)"
+# Days since the Unix epoch -> smallest snowflake that can fall on that day
+FIRST_MESSAGE_OF_DAY = "((({0}) * 86400000 - 1420070400000) << 22)"
+# How many of each day's most starred messages daily_top keeps per guild; caps /topmessages
+DAILY_TOP_SIZE = 10
+
+def refresh_daily_top(guild_id, message_id):
+    """Trigger statements rebuilding daily_top for the guild and day of a starboard row"""
+    day = DAY_OF_MESSAGE.format(message_id)
+    return f'''
+        DELETE FROM daily_top WHERE guild_id = {guild_id} AND day = {day};
+        INSERT INTO daily_top
+            SELECT guild_id, {day}, message_id, channel_id, author_id, reaction_count FROM starboard
+            WHERE guild_id = {guild_id} AND message_id >= {FIRST_MESSAGE_OF_DAY.format(day)}
+                AND message_id < {FIRST_MESSAGE_OF_DAY.format(day + " + 1")}
+            ORDER BY reaction_count DESC, message_id LIMIT {DAILY_TOP_SIZE};'''
+
+# Schema changes applied in order on top of create_tables; PRAGMA user_version counts how many ran
+MIGRATIONS = [
+    # 1: lookup indexes and star aggregates kept up to date by triggers
+    f'''
+    CREATE INDEX IF NOT EXISTS starboard_guild ON starboard (guild_id, message_id);
+    CREATE INDEX IF NOT EXISTS starboard_author ON starboard (author_id);
+    CREATE INDEX IF NOT EXISTS starboard_channel ON starboard (channel_id);
+
+    CREATE TABLE IF NOT EXISTS author_stars (
+        guild_id INTEGER,
+        author_id INTEGER,
+        messages INTEGER,
+        stars INTEGER,
+        PRIMARY KEY (guild_id, author_id)
+    );
+    CREATE INDEX IF NOT EXISTS author_stars_rank ON author_stars (guild_id, stars);
+    CREATE TABLE IF NOT EXISTS channel_stars (
+        guild_id INTEGER,
+        channel_id INTEGER,
+        messages INTEGER,
+        stars INTEGER,
+        PRIMARY KEY (guild_id, channel_id)
+    );
+    CREATE INDEX IF NOT EXISTS channel_stars_rank ON channel_stars (guild_id, stars);
+    CREATE TABLE IF NOT EXISTS daily_stars (
+        guild_id INTEGER,
+        day INTEGER,
+        messages INTEGER,
+        stars INTEGER,
+        PRIMARY KEY (guild_id, day)
+    );
+
+    INSERT OR REPLACE INTO author_stars
+        SELECT guild_id, author_id, COUNT(*), SUM(reaction_count) FROM starboard GROUP BY guild_id, author_id;
+    INSERT OR REPLACE INTO channel_stars
+        SELECT guild_id, channel_id, COUNT(*), SUM(reaction_count) FROM starboard GROUP BY guild_id, channel_id;
+    INSERT OR REPLACE INTO daily_stars
+        SELECT guild_id, {DAY_OF_MESSAGE.format("message_id")} AS day, COUNT(*), SUM(reaction_count) FROM starboard GROUP BY guild_id, day;
+
+    CREATE TRIGGER IF NOT EXISTS starboard_stars_insert AFTER INSERT ON starboard BEGIN
+        INSERT INTO author_stars VALUES (NEW.guild_id, NEW.author_id, 1, NEW.reaction_count)
+            ON CONFLICT (guild_id, author_id) DO UPDATE SET messages = messages + 1, stars = stars + excluded.stars;
+        INSERT INTO channel_stars VALUES (NEW.guild_id, NEW.channel_id, 1, NEW.reaction_count)
+            ON CONFLICT (guild_id, channel_id) DO UPDATE SET messages = messages + 1, stars = stars + excluded.stars;
+        INSERT INTO daily_stars VALUES (NEW.guild_id, {DAY_OF_MESSAGE.format("NEW.message_id")}, 1, NEW.reaction_count)
+            ON CONFLICT (guild_id, day) DO UPDATE SET messages = messages + 1, stars = stars + excluded.stars;
+    END;
+    CREATE TRIGGER IF NOT EXISTS starboard_stars_update AFTER UPDATE OF reaction_count ON starboard BEGIN
+        UPDATE author_stars SET stars = stars + NEW.reaction_count - OLD.reaction_count
+            WHERE guild_id = OLD.guild_id AND author_id = OLD.author_id;
+        UPDATE channel_stars SET stars = stars + NEW.reaction_count - OLD.reaction_count
+            WHERE guild_id = OLD.guild_id AND channel_id = OLD.channel_id;
+        UPDATE daily_stars SET stars = stars + NEW.reaction_count - OLD.reaction_count
+            WHERE guild_id = OLD.guild_id AND day = {DAY_OF_MESSAGE.format("OLD.message_id")};
+    END;
+    CREATE TRIGGER IF NOT EXISTS starboard_stars_delete AFTER DELETE ON starboard BEGIN
+        UPDATE author_stars SET messages = messages - 1, stars = stars - OLD.reaction_count
+            WHERE guild_id = OLD.guild_id AND author_id = OLD.author_id;
+        UPDATE channel_stars SET messages = messages - 1, stars = stars - OLD.reaction_count
+            WHERE guild_id = OLD.guild_id AND channel_id = OLD.channel_id;
+        UPDATE daily_stars SET messages = messages - 1, stars = stars - OLD.reaction_count
+            WHERE guild_id = OLD.guild_id AND day = {DAY_OF_MESSAGE.format("OLD.message_id")};
+    END;
+    ''',
+    # 2: each day's most starred messages, so /topmessages reads a few rows per day instead of the whole week
+    f'''
+    CREATE TABLE IF NOT EXISTS daily_top (
+        guild_id INTEGER,
+        day INTEGER,
+        message_id INTEGER PRIMARY KEY,
+        channel_id INTEGER,
+        author_id INTEGER,
+        reaction_count INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS daily_top_day ON daily_top (guild_id, day);
+
+    INSERT OR REPLACE INTO daily_top
+        SELECT guild_id, day, message_id, channel_id, author_id, reaction_count FROM (
+            SELECT *, {DAY_OF_MESSAGE.format("message_id")} AS day, ROW_NUMBER() OVER (
+                PARTITION BY guild_id, {DAY_OF_MESSAGE.format("message_id")} ORDER BY reaction_count DESC, message_id
+            ) AS rank FROM starboard
+        ) WHERE rank <= {DAILY_TOP_SIZE};
+
+    CREATE TRIGGER IF NOT EXISTS starboard_top_insert AFTER INSERT ON starboard BEGIN
+        {refresh_daily_top("NEW.guild_id", "NEW.message_id")}
+    END;
+    CREATE TRIGGER IF NOT EXISTS starboard_top_update AFTER UPDATE OF reaction_count ON starboard BEGIN
+        {refresh_daily_top("NEW.guild_id", "NEW.message_id")}
+    END;
+    CREATE TRIGGER IF NOT EXISTS starboard_top_delete AFTER DELETE ON starboard BEGIN
+        {refresh_daily_top("OLD.guild_id", "OLD.message_id")}
+    END;
+    ''',
+]
+
+# One thread owns the connection, so calls are serialized and never block the event loop
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+_connection = None
 
 def get_connection():
-    return sqlite3.connect(DB_PATH)
+    """Return the long-lived connection; only call this on the database thread"""
+    global _connection
+    if _connection is None:
+        # Statements are reused from sqlite3's per-connection statement cache
+        _connection = sqlite3.connect(DB_PATH, cached_statements=256)
+        for pragma in PRAGMAS:
+            _connection.execute(pragma)
+    return _connection
+
+def off_loop(fn):
+    """Turn a blocking database function into a coroutine run on the database thread"""
+    @functools.wraps(fn)
+    async def wrapper(*args):
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+        finally:
+            # Includes time spent queued behind other calls on the database thread
+            metrics.observe("db_call_seconds", time.perf_counter() - start, function=fn.__name__)
+    wrapper.sync = fn
+    return wrapper
 
+@off_loop
+def close():
+    global _connection
+    if _connection is not None:
+        _connection.execute("PRAGMA optimize")
+        _connection.close()
+        _connection = None
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+
+@off_loop
 def create_tables():
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -19,7 +183,88 @@ def create_tables():
             reaction_count INTEGER
         )
         ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS run_watermark (
+            game_id TEXT PRIMARY KEY,
+            run_id TEXT,
+            submitted TEXT
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS watched_games (
+            game_id TEXT,
+            channel_id INTEGER,
+            PRIMARY KEY (game_id, channel_id)
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS seeded_defaults (
+            name TEXT PRIMARY KEY
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            threshold INTEGER,
+            emoji_id INTEGER,
+            board_channel_id INTEGER,
+            ignored_channels TEXT
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS backfill_progress (
+            channel_id INTEGER PRIMARY KEY,
+            guild_id INTEGER,
+            last_message_id INTEGER
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tracked_runners (
+            user_id TEXT,
+            channel_id INTEGER,
+            user_name TEXT,
+            PRIMARY KEY (user_id, channel_id)
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pb_snapshots (
+            user_id TEXT PRIMARY KEY,
+            user_name TEXT,
+            fetched_at REAL,
+            records TEXT
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS refresh_backoff (
+            user_id TEXT PRIMARY KEY,
+            failures INTEGER,
+            retry_at REAL
+        )
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS pb_snapshots_name ON pb_snapshots (user_name COLLATE NOCASE)
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id INTEGER,
+            content TEXT,
+            created_at REAL
+        )
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS poll_status (
+            game_id TEXT PRIMARY KEY,
+            interval REAL,
+            lag REAL,
+            last_poll REAL,
+            last_error TEXT,
+            updated_at REAL
+        )
+        ''')
         conn.commit()
+    migrate(get_connection())
+@off_loop
 def add_starred_message(message_id, star_message_id, embed_message_id, channel_id, guild_id, author_id, reaction_count):
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -28,6 +273,7 @@ def add_starred_message(message_id, star_message_id, embed_message_id, channel_i
         VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (message_id, star_message_id, embed_message_id, channel_id, guild_id, author_id, reaction_count))
         conn.commit()
+@off_loop
 def remove_starred_message(message_id):
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -35,6 +281,7 @@ def remove_starred_message(message_id):
         DELETE FROM starboard WHERE message_id = ?
         ''', (message_id,))
         conn.commit()
+@off_loop
 def get_starred_message(message_id):
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -42,6 +289,7 @@ def get_starred_message(message_id):
         SELECT * FROM starboard WHERE message_id = ?
         ''', (message_id,))
         return cursor.fetchone()
+@off_loop
 def update_reaction_count(message_id, reaction_count):
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -49,9 +297,268 @@ def update_reaction_count(message_id, reaction_count):
         UPDATE starboard SET reaction_count = ? WHERE message_id = ?
         ''', (reaction_count, message_id))
         conn.commit()
+@off_loop
 def get_all_starred_messages():
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM starboard')
         return cursor.fetchall()
-    
\ No newline at end of file
+@off_loop
+def get_run_watermark(game_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT run_id, submitted FROM run_watermark WHERE game_id = ?
+        ''', (game_id,))
+        return cursor.fetchone()
+@off_loop
+def set_run_watermark(game_id, run_id, submitted):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO run_watermark (game_id, run_id, submitted)
+        VALUES (?, ?, ?)
+        ''', (game_id, run_id, submitted))
+        conn.commit()
+@off_loop
+def get_watched_games():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT game_id, channel_id FROM watched_games')
+        return cursor.fetchall()
+@off_loop
+def seed_watched_game(game_id, channel_id):
+    """Watch a default game the first time the bot runs against this database, never again after that"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR IGNORE INTO seeded_defaults (name) VALUES ('watched_games')")
+        if cursor.rowcount:
+            cursor.execute('''
+            INSERT INTO watched_games (game_id, channel_id) SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM watched_games)
+            ''', (game_id, channel_id))
+        conn.commit()
+@off_loop
+def add_watched_game(game_id, channel_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT OR IGNORE INTO watched_games (game_id, channel_id) VALUES (?, ?)
+        ''', (game_id, channel_id))
+        conn.commit()
+@off_loop
+def remove_watched_game(game_id, channel_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        DELETE FROM watched_games WHERE game_id = ? AND channel_id = ?
+        ''', (game_id, channel_id))
+        conn.commit()
+@off_loop
+def get_all_guild_settings():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT guild_id, threshold, emoji_id, board_channel_id, ignored_channels FROM guild_settings')
+        return cursor.fetchall()
+@off_loop
+def set_guild_settings(guild_id, threshold, emoji_id, board_channel_id, ignored_channels):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO guild_settings (guild_id, threshold, emoji_id, board_channel_id, ignored_channels)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (guild_id, threshold, emoji_id, board_channel_id, ignored_channels))
+        conn.commit()
+@off_loop
+def get_top_authors(guild_id, limit):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT author_id, messages, stars FROM author_stars
+        WHERE guild_id = ? AND messages > 0 ORDER BY stars DESC LIMIT ?
+        ''', (guild_id, limit))
+        return cursor.fetchall()
+@off_loop
+def get_top_channels(guild_id, limit):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT channel_id, messages, stars FROM channel_stars
+        WHERE guild_id = ? AND messages > 0 ORDER BY stars DESC LIMIT ?
+        ''', (guild_id, limit))
+        return cursor.fetchall()
+@off_loop
+def get_channel_stars(guild_id, channel_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT messages, stars FROM channel_stars WHERE guild_id = ? AND channel_id = ?
+        ''', (guild_id, channel_id))
+        return cursor.fetchone()
+@off_loop
+def get_top_messages_since_day(guild_id, day, limit):
+    """Most starred messages from `day` on; at most DAILY_TOP_SIZE, as that is all daily_top keeps per day"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT message_id, channel_id, author_id, reaction_count FROM daily_top
+        WHERE guild_id = ? AND day >= ? ORDER BY reaction_count DESC, message_id LIMIT ?
+        ''', (guild_id, day, min(limit, DAILY_TOP_SIZE)))
+        return cursor.fetchall()
+@off_loop
+def get_stars_since_day(guild_id, day):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT COALESCE(SUM(messages), 0), COALESCE(SUM(stars), 0) FROM daily_stars
+        WHERE guild_id = ? AND day >= ?
+        ''', (guild_id, day))
+        return cursor.fetchone()
+@off_loop
+def get_starred_in_range(channel_id, after_id, before_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT message_id FROM starboard WHERE channel_id = ? AND message_id > ? AND message_id <= ?
+        ''', (channel_id, after_id, before_id))
+        return [row[0] for row in cursor.fetchall()]
+@off_loop
+def get_backfill_checkpoint(channel_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT last_message_id FROM backfill_progress WHERE channel_id = ?', (channel_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+@off_loop
+def set_backfill_checkpoint(channel_id, guild_id, last_message_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO backfill_progress (channel_id, guild_id, last_message_id) VALUES (?, ?, ?)
+        ''', (channel_id, guild_id, last_message_id))
+        conn.commit()
+@off_loop
+def clear_backfill_checkpoints(guild_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM backfill_progress WHERE guild_id = ?', (guild_id,))
+        conn.commit()
+@off_loop
+def add_tracked_runner(user_id, channel_id, user_name):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO tracked_runners (user_id, channel_id, user_name) VALUES (?, ?, ?)
+        ''', (user_id, channel_id, user_name))
+        conn.commit()
+@off_loop
+def remove_tracked_runner(user_id, channel_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM tracked_runners WHERE user_id = ? AND channel_id = ?', (user_id, channel_id))
+        conn.commit()
+        return cursor.rowcount
+@off_loop
+def get_tracked_runners():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT user_id, channel_id, user_name FROM tracked_runners')
+        return cursor.fetchall()
+@off_loop
+def get_stalest_tracked_runner(older_than):
+    """Return (user_id, user_name) of the tracked runner whose snapshot is oldest, if older than `older_than`
+
+    Runners whose last refresh failed are skipped until their backoff runs out.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT t.user_id, t.user_name FROM tracked_runners AS t
+        LEFT JOIN pb_snapshots AS s ON s.user_id = t.user_id
+        LEFT JOIN refresh_backoff AS b ON b.user_id = t.user_id
+        WHERE (s.fetched_at IS NULL OR s.fetched_at < ?) AND (b.retry_at IS NULL OR b.retry_at <= ?)
+        ORDER BY COALESCE(s.fetched_at, 0) LIMIT 1
+        ''', (older_than, time.time()))
+        return cursor.fetchone()
+@off_loop
+def add_refresh_failure(user_id, base_delay, max_delay):
+    """Count a failed PB refresh and hold the runner back for base_delay, doubling per failure up to max_delay"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        now = time.time()
+        cursor.execute('''
+        INSERT INTO refresh_backoff (user_id, failures, retry_at) VALUES (?, 1, ?)
+        ON CONFLICT (user_id) DO UPDATE SET failures = failures + 1, retry_at = ? + MIN(? * (1 << failures), ?)
+        ''', (user_id, now + base_delay, now, base_delay, max_delay))
+        conn.commit()
+@off_loop
+def get_pb_snapshot(user_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT user_name, fetched_at, records FROM pb_snapshots WHERE user_id = ?', (user_id,))
+        return cursor.fetchone()
+@off_loop
+def get_pb_snapshot_by_name(user_name):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT user_id, user_name, fetched_at, records FROM pb_snapshots WHERE user_name = ? COLLATE NOCASE
+        ''', (user_name,))
+        return cursor.fetchone()
+@off_loop
+def set_pb_snapshot(user_id, user_name, fetched_at, records):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        INSERT OR REPLACE INTO pb_snapshots (user_id, user_name, fetched_at, records) VALUES (?, ?, ?, ?)
+        ''', (user_id, user_name, fetched_at, records))
+        # A stored snapshot is a successful refresh
+        cursor.execute('DELETE FROM refresh_backoff WHERE user_id = ?', (user_id,))
+        conn.commit()
+@off_loop
+def add_outbox_message(channel_id, content):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('INSERT INTO outbox (channel_id, content, created_at) VALUES (?, ?, ?)', (channel_id, content, time.time()))
+        conn.commit()
+@off_loop
+def get_outbox_messages(limit):
+    """Oldest undelivered announcements first"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, channel_id, content, created_at FROM outbox ORDER BY id LIMIT ?', (limit,))
+        return cursor.fetchall()
+@off_loop
+def remove_outbox_message(outbox_id):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM outbox WHERE id = ?', (outbox_id,))
+        conn.commit()
+@off_loop
+def get_pb_names():
+    """(game, category, PB count) for every game and category in the stored PB snapshots"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Snapshot rows are PBRecord.to_row() lists: index 5 is the game name, 6 the category name
+        cursor.execute('''
+        SELECT json_extract(r.value, '$[5]') AS game, json_extract(r.value, '$[6]') AS category, COUNT(*)
+        FROM pb_snapshots, json_each(pb_snapshots.records) AS r
+        GROUP BY game, category
+        ''')
+        return cursor.fetchall()
+@off_loop
+def set_poll_status(rows):
+    """Replace the published poll state with (game_id, interval, lag, last_poll, last_error) rows"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM poll_status')
+        cursor.executemany('''
+        INSERT INTO poll_status (game_id, interval, lag, last_poll, last_error, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(*row, time.time()) for row in rows])
+        conn.commit()
+@off_loop
+def get_poll_status():
+    """game_id -> (interval, lag, last_poll, last_error, updated_at) as last published by the worker"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT game_id, interval, lag, last_poll, last_error, updated_at FROM poll_status')
+        return {row[0]: row[1:] for row in cursor.fetchall()}
\ No newline at end of file
@@ -0,0 +1,46 @@
+import re
+from functools import lru_cache
+
+# speedrun.com durations look like PT1H23M45.678S; days are allowed by ISO-8601 but unused in practice
+_DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)(?:\.(\d+))?S)?)?")
+NOT_AVAILABLE = "Time not available"
+
+@lru_cache(maxsize=4096)
+def parse_ms(text):
+    """Parse an ISO-8601 duration into integer milliseconds, or None if it is not one"""
+    if not text:
+        return None
+    match = _DURATION.fullmatch(text)
+    if match is None or text in ("P", "PT"):
+        return None
+    days, hours, minutes, seconds, fraction = match.groups()
+    ms = ((int(days or 0) * 24 + int(hours or 0)) * 60 + int(minutes or 0)) * 60000 + int(seconds or 0) * 1000
+    if fraction:
+        # ".6" is 600 ms, not 6 ms; anything past milliseconds is dropped
+        ms += int(fraction[:3].ljust(3, "0"))
+    return ms
+
+# PB lists and leaderboards repeat the same handful of times, so formatted strings are reused
+@lru_cache(maxsize=4096)
+def format_ms(ms):
+    """Format milliseconds like 1h 2m 3.456s, 2m 3.456s or 3.456s"""
+    if ms is None:
+        return NOT_AVAILABLE
+    seconds, milliseconds = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours > 0:
+        return f"{hours}h {minutes}m {seconds}.{milliseconds:03d}s"
+    elif minutes > 0:
+        return f"{minutes}m {seconds}.{milliseconds:03d}s"
+    else:
+        return f"{seconds}.{milliseconds:03d}s"
+
+def format_many(values):
+    """Format a whole list of millisecond times at once, e.g. every PB of a player or a leaderboard page"""
+    fmt = format_ms
+    return [fmt(ms) for ms in values]
+
+def format_duration(text):
+    """Format an ISO-8601 duration from speedrun.com for display"""
+    return format_ms(parse_ms(text))
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+from array import array
+import duration
+import srcom
+from cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+# === Configuration ===
+BOARD_TTL = 10 * 60  # boards younger than this are served without asking speedrun.com
+BOARD_MAX_STALE = 24 * 60 * 60  # older boards are refetched before answering instead of served stale
+BOARD_CACHE_SIZE = 64
+
+# === Global Variables ===
+# (game_id, category_id) -> Board; entries past BOARD_TTL stay readable through peek() until evicted
+boards = TTLCache(maxsize=BOARD_CACHE_SIZE, ttl=BOARD_TTL)
+_refreshing = {}  # (game_id, category_id) -> background refresh task
+board_stats = {"fresh": 0, "stale": 0, "fetched": 0, "refreshed": 0, "refresh_errors": 0}
+
+class Board:
+    """One category leaderboard, parsed once: places and times in arrays, players joined into display strings"""
+    __slots__ = ("game", "category", "weblink", "places", "times_ms", "players", "links", "fetched_at")
+
+    def __init__(self, game, category, weblink, fetched_at):
+        self.game = game
+        self.category = category
+        self.weblink = weblink
+        self.places = array("i")
+        self.times_ms = array("q")  # -1 when a run has no time
+        self.players = []
+        self.links = []
+        self.fetched_at = fetched_at
+
+    def __len__(self):
+        return len(self.places)
+
+    @classmethod
+    def from_payload(cls, game, category, data):
+        board = cls(game, category, data.get("weblink", ""), time.time())
+        # Embedded players are resolved to names once here, not on every render; guests carry their name in the run
+        names = {player.get("id"): player.get("names", {}).get("international", "Unknown")
+                 for player in data.get("players", {}).get("data", []) if player.get("rel") == "user"}
+        for entry in data.get("runs", []):
+            run = entry.get("run", {})
+            time_ms = duration.parse_ms(run.get("times", {}).get("primary"))
+            board.places.append(entry.get("place") or 0)
+            board.times_ms.append(-1 if time_ms is None else time_ms)
+            board.players.append(", ".join(
+                player.get("name", "Guest") if player.get("rel") == "guest" else names.get(player.get("id"), "Unknown")
+                for player in run.get("players", [])
+            ))
+            board.links.append(run.get("weblink", ""))
+        return board
+
+    def times(self, start, stop):
+        """Formatted times of entries start..stop-1, e.g. one page of the board"""
+        return duration.format_many([None if time_ms < 0 else time_ms for time_ms in self.times_ms[start:stop]])
+
+# === Stale-while-revalidate ===
+async def get(game_id, category_id, game, category):
+    """Return the Board for a category, serving a stale copy while a background refresh runs"""
+    key = (game_id, category_id)
+    board = boards.get(key)
+    if board is not None:
+        board_stats["fresh"] += 1
+        return board
+    stale = boards.peek(key)
+    if stale is not None and time.time() - stale.fetched_at < BOARD_MAX_STALE:
+        board_stats["stale"] += 1
+        if key not in _refreshing:
+            task = _refreshing[key] = asyncio.create_task(_refresh(key, game, category))
+            task.add_done_callback(lambda done: _refreshing.pop(key, None))
+        return stale
+    board_stats["fetched"] += 1
+    board = Board.from_payload(game, category, await srcom.fetch_leaderboard(game_id, category_id))
+    boards.set(key, board)
+    return board
+
+async def _refresh(key, game, category):
+    try:
+        data = await srcom.fetch_leaderboard(*key, priority=srcom.PRIORITY_BACKGROUND)
+    except srcom.FETCH_ERRORS as e:
+        # The stale board stays in place; the next request tries again
+        board_stats["refresh_errors"] += 1
+        log.warning("event=leaderboard_refresh_failed game=%s category=%s error=%r", key[0], key[1], e)
+        return
+    boards.set(key, Board.from_payload(game, category, data))
+    board_stats["refreshed"] += 1
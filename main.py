@@ -1,9 +1,26 @@
+import asyncio
+import functools
+import logging
 import os
-import requests
 import discord
-from discord.ext import commands, tasks
+from discord import app_commands
+from discord.ext import commands
 from dotenv import load_dotenv
+import time
+from datetime import datetime, timedelta, timezone
 import database
+import duration
+import leaderboards
+import metrics
+import names
+import notifier
+import poller
+from paginator import Paginator
+import pbs
+import settings
+import srcom
+import starboard
+import tracker
 # === Configuration ===
 load_dotenv()
 TOKEN = os.getenv("TESTING_BOT_TOKEN")
@@ -11,181 +28,139 @@ CHANNEL_ID = 1367988776781090926
 CHANNEL_ID_APPELBOARD = 1368024850098294856
 GAME_ID = "v1pxo8m6"
 amount = 2
+OWNER_IDS = [1246624937066758167, 997270873847382126]
+BACKFILL_PAGE_SIZE = 100  # Discord's maximum per history request
+BACKFILL_DEFAULT_DAYS = 30
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # 0 disables the /metrics endpoint
+# AUTO_SHARD=1 runs every shard in this process; SHARD_COUNT overrides Discord's recommended count
+AUTO_SHARD = os.getenv("AUTO_SHARD", "0") == "1"
+SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+# "inline" polls speedrun.com here; "worker" leaves polling and PB refreshes to worker.py and only delivers its announcements
+POLLER_MODE = os.getenv("POLLER_MODE", "inline")
+# LOW_MEMORY=1 trims intents and the client cache to what the starboard and commands use
+LOW_MEMORY = os.getenv("LOW_MEMORY", "0") == "1"
+MAX_MESSAGES = int(os.getenv("MAX_MESSAGES", "200" if LOW_MEMORY else "1000"))  # client message cache size
+
+log = logging.getLogger("appel_bot")
 
 # === Intents ===
-intents = discord.Intents.default()
-intents.message_content = True
-intents.reactions = True
-intents.messages = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+if LOW_MEMORY:
+    # Guilds and channels, the appel emoji, guild messages and guild reactions; no typing, voice, invite or DM events
+    intents = discord.Intents(guilds=True, emojis_and_stickers=True, guild_messages=True, guild_reactions=True, message_content=True)
+else:
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.reactions = True
+    intents.messages = True
+cache_options = {"max_messages": MAX_MESSAGES}
+if LOW_MEMORY:
+    # Reaction payloads carry the reacting member, so no member needs to be cached besides the bot's own
+    cache_options.update(member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+
+class AppelTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction):
+        # Runs before every slash command; the matching observe is in on_app_command_completion
+        interaction.extras["started"] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction, error):
+        command = interaction.command.qualified_name if interaction.command else "unknown"
+        metrics.inc("command_errors_total", command=command)
+        started = interaction.extras.get("started")
+        if started is not None:
+            metrics.observe("command_seconds", time.perf_counter() - started, command=command)
+        await super().on_error(interaction, error)
+
+class AppelBot(commands.AutoShardedBot if AUTO_SHARD else commands.Bot):
+    async def setup_hook(self):
+        await database.create_tables()
+        # Loaded before any handler or worker can run, as they all read the index
+        await starboard.load()
+        # Only on first run, so unwatching every game sticks across restarts
+        await database.seed_watched_game(GAME_ID, CHANNEL_ID)
+        await settings.load()
+        settings.add_listener(lambda config: board_channel_ids.pop(config.guild_id, None))
+        starboard.start_workers()
+        if METRICS_PORT:
+            await metrics.start_server(METRICS_HOST, METRICS_PORT)
+
+    async def close(self):
+        await starboard.flush_all()
+        await starboard.stop_workers()
+        await srcom.close_session()
+        await metrics.stop_server()
+        await super().close()
+        await database.close()
+
+bot = AppelBot(command_prefix="!", intents=intents, tree_cls=AppelTree, shard_count=SHARD_COUNT, **cache_options)
 
 # === Global Variables ===
-session = requests.Session()
-last_run_id = None
 appel_emoji = None
+# guild_id -> board channel id (None when the guild has no board channel)
+board_channel_ids = {}
 
 # === Speedrun.com Feature ===
-def fetch_latest_run():
-    url = f"https://www.speedrun.com/api/v1/runs?game={GAME_ID}&orderby=submitted&direction=desc&max=1"
-    response = session.get(url, timeout=5)
-    response.raise_for_status()
-    return response.json().get("data", [None])[0]
-
 def extract_link(run):
     return run.get("weblink", "No link available") if run else None
 
-def fetch_player_pbs(player_name):
-    """Fetch all personal bests for a player by username"""
-    # First get the user ID from the username
-    user_url = f"https://www.speedrun.com/api/v1/users?lookup={player_name}"
-    try:
-        user_response = session.get(user_url, timeout=5)
-        user_response.raise_for_status()
-        user_data = user_response.json().get("data", [])
-        
-        if not user_data:
-            return None, f"Player '{player_name}' not found"
-        
-        user_id = user_data[0].get("id")
-        user_name = user_data[0].get("names", {}).get("international", player_name)
-        
-        # Now get the PBs using the user ID with proper embedding to reduce API calls
-        # Include game, category, and level data in the response using the embed parameter
-        pbs_url = f"https://www.speedrun.com/api/v1/users/{user_id}/personal-bests?embed=game,category,level"
-        pbs_response = session.get(pbs_url, timeout=5)
-        pbs_response.raise_for_status()
-        pbs_data = pbs_response.json().get("data", [])
-        
-        return {
-            "user_name": user_name,
-            "pbs": pbs_data
-        }, None
-    except requests.RequestException as e:
-        return None, f"Error fetching data: {str(e)}"
-
-def format_time(run_time):
-    """Format the run time from Speedrun.com"""
-    if not run_time:
-        return "Time not available"
-
-    # Convert PT1H23M45S format to readable format
-    time_str = run_time.replace("PT", "")
-    hours = 0
-    minutes = 0
-    seconds = 0
-    milliseconds = 0
-    
-    # Handle hours
-    if "H" in time_str:
-        h_split = time_str.split("H")
-        hours = int(h_split[0])
-        time_str = h_split[1]
-    
-    # Handle minutes
-    if "M" in time_str:
-        m_split = time_str.split("M")
-        minutes = int(m_split[0])
-        time_str = m_split[1]
-    
-    # Handle seconds and milliseconds
-    if "S" in time_str:
-        s_split = time_str.split("S")[0]
-        if "." in s_split:
-            s_parts = s_split.split(".")
-            seconds = int(s_parts[0])
-            milliseconds = int(s_parts[1])
-        else:
-            seconds = int(s_split)
-    
-    # Format the time based on components
-    if hours > 0:
-        return f"{hours}h {minutes}m {seconds}.{milliseconds:03d}s"
-    elif minutes > 0:
-        return f"{minutes}m {seconds}.{milliseconds:03d}s"
-    else:
-        return f"{seconds}.{milliseconds:03d}s"
-
-@tasks.loop(seconds=5)
-async def check_new_run():
-    global last_run_id
-    run = fetch_latest_run()
-    if not run:
-        print("No run found.")
-        return
-    current_run_id = run.get("id")
-    if current_run_id == last_run_id:
-        return
-    last_run_id = current_run_id
-    link = extract_link(run)
-    channel = bot.get_channel(CHANNEL_ID)
-    if channel:
-        await channel.send(f"🎉 **New Run!**\n{link}")
-    else:
-        print("Channel not found.")
-
 # === Events and Commands ===
 @bot.event
+@metrics.instrument_event
 async def on_ready():
     global appel_emoji
     appel_emoji = discord.utils.get(bot.emojis, name="appel")
-    print(f"Logged in as {bot.user} (ID: {bot.user.id})")
-    print(f"Using emoji: {appel_emoji}")
-    check_new_run.start()
+    log.info("event=ready user=%s user_id=%s emoji=%s shards=%s poller=%s", bot.user, bot.user.id, appel_emoji, bot.shard_count, POLLER_MODE)
+    await names.start()
+    if POLLER_MODE == "worker":
+        # Only for /watchlist; the worker process does the polling
+        await poller.load_watches()
+        await notifier.start_delivery(bot)
+    else:
+        notifier.use_bot(bot)
+        await poller.start()
+        await tracker.start()
 
 @bot.tree.command(name="latest_run", description="Get the latest speedrun.com run for Appel.")
 async def latest_run(interaction: discord.Interaction):
-    run = fetch_latest_run()
+    # A rate-limited or retried request can take longer than Discord's 3 second window
+    await interaction.response.defer()
+    try:
+        run = await srcom.fetch_latest_run(GAME_ID)
+    except srcom.FETCH_ERRORS as e:
+        await interaction.followup.send(f"Error: Error fetching data: {e}")
+        return
     if not run:
-        await interaction.response.send_message("No runs found")
+        await interaction.followup.send("No runs found")
         return
     link = extract_link(run)
-    await interaction.response.send_message(f"**Latest Run!**\n{link}")
+    await interaction.followup.send(f"**Latest Run!**\n{link}")
     
 @bot.tree.command(name="getallpbs", description="Get a player's personal best for a specific game and category")
 async def get_pb(interaction: discord.Interaction, player: str, game: str, category: str = None):
     """Get a player's personal best for a specific game and category"""
     await interaction.response.defer()
-    data, error = fetch_player_pbs(player)
+    data, error = await tracker.get_player_pbs(player)
     
     if error:
         await interaction.followup.send(f"Error: {error}")
         return
     
     user_name = data["user_name"]
-    pbs = data["pbs"]  # Already contains only PBs, not obsolete runs
+    records = data["records"]  # Already contains only PBs, not obsolete runs
     
-    if not pbs:
+    if not records.records:
         await interaction.followup.send(f"No personal bests found for {user_name}")
         return
         
-    # Filter by game name (case-insensitive partial match)
-    matching_pbs = []
-    for pb in pbs:
-        game_data = pb.get("game", {}).get("data", {})
-        game_name = game_data.get("names", {}).get("international", "Unknown Game")
-        
-        if game.lower() in game_name.lower():
-            category_data = pb.get("category", {}).get("data", {})
-            category_name = category_data.get("name", "Unknown Category")
-            
-            # Check if this is a level run (individual level) or a full-game run
-            level_data = pb.get("level", {}).get("data", {})
-            level_info = ""
-            if level_data:
-                level_name = level_data.get("name", "Unknown Level")
-                level_info = f" {level_name}"
-            
-            # If category is specified, filter by it too
-            if category is None or category.lower() in category_name.lower():
-                matching_pbs.append({
-                    "game": game_name,
-                    "category": category_name,
-                    "level": level_info,
-                    "place": pb.get("place", 0),
-                    "time": format_time(pb["run"].get("times", {}).get("primary")),
-                    "date": pb["run"].get("date", "Unknown date"),
-                    "link": pb["run"].get("weblink", "")
-                })
+    # Filter by game name and category (case-insensitive partial match); records are already sorted by place
+    game_filter = game.lower()
+    category_filter = category.lower() if category else None
+    matching_pbs = [
+        pb for pb in records.records
+        if game_filter in pb.game.lower() and (category_filter is None or category_filter in pb.category.lower())
+    ]
     
     if not matching_pbs:
         message = f"No personal bests found for {user_name} in games matching '{game}'"
@@ -194,155 +169,69 @@ async def get_pb(interaction: discord.Interaction, player: str, game: str, categ
         await interaction.followup.send(message)
         return
         
-    # Sort by place (lowest number first)
-    matching_pbs.sort(key=lambda x: (x["place"] if isinstance(x["place"], int) else 999))
-    
-    # Create embeds for results - maximum 5 messages with as many PBs as possible per message
-    MAX_MESSAGES = 5
     PBs_PER_EMBED = 25  # Discord embed limit is 25 fields
     
-    # Calculate how many PBs we can show with our message limit
-    total_pbs_to_show = min(len(matching_pbs), MAX_MESSAGES * PBs_PER_EMBED)
-    
-    # Create list to hold our embeds
-    embeds = []
-    
-    # Create embeds, each with up to PBs_PER_EMBED fields
-    for i in range(0, total_pbs_to_show, PBs_PER_EMBED):
-        # Get the chunk of PBs for this embed
-        embed_pbs = matching_pbs[i:min(i+PBs_PER_EMBED, total_pbs_to_show)]
-        
-        # Create the embed
+    def render_page(page):
+        # Get the chunk of PBs for this page
+        embed_pbs = matching_pbs[page * PBs_PER_EMBED:(page + 1) * PBs_PER_EMBED]
         embed = discord.Embed(
-            title=f"Personal Bests for {user_name}" + (f" (Page {i//PBs_PER_EMBED + 1})" if i > 0 else ""),
+            title=f"Personal Bests for {user_name}",
+            description=f"{len(matching_pbs)} matching results",
             color=discord.Color.gold()
         )
         
         # Add fields for each PB
         for pb in embed_pbs:
-            emoji = "🥇" if pb["place"] == 1 else "🥈" if pb["place"] == 2 else "🥉" if pb["place"] == 3 else f"#{pb['place']}"
-            value = f"[{emoji} **Time:** {pb['time']}\n]({pb['link']})"
-            embed.add_field(name=f"{pb['game']} - {pb['category']}{pb['level']}", value=value, inline=False)
-        
-        embeds.append(embed)
-    
-    # Add footer to the last embed if we didn't show all PBs
-    if len(matching_pbs) > total_pbs_to_show:
-        embeds[-1].set_footer(text=f"Showing {total_pbs_to_show} of {len(matching_pbs)} matching results")
+            value = f"[{pb.place_emoji} **Time:** {pb.time}\n]({pb.link})"
+            level = f" {pb.level}" if pb.level else ""
+            embed.add_field(name=f"{pb.game} - {pb.category}{level}", value=value, inline=False)
+        return embed
     
-    # Send the embeds
-    for embed in embeds:
-        await interaction.followup.send(embed=embed)
+    page_count = (len(matching_pbs) + PBs_PER_EMBED - 1) // PBs_PER_EMBED
+    await Paginator(page_count, render_page, interaction.user.id).send(interaction)
 
 @bot.tree.command(name="pbs", description="Get a player's personal bests from speedrun.com")
 async def get_pbs(interaction: discord.Interaction, player: str, game: str = None, showall: bool = False):
     """Get all personal bests for a player, optionally filtered by game name"""
     await interaction.response.defer()
-    data, error = fetch_player_pbs(player)
+    data, error = await tracker.get_player_pbs(player)
     
     if error:
         await interaction.followup.send(f"Error: {error}")
         return
     
     user_name = data["user_name"]
-    pbs = data["pbs"]
+    records = data["records"]
     
-    if not pbs:
+    if not records.records:
         await interaction.followup.send(f"No personal bests found for {user_name}")
         return
     
-    # Group PBs by game
-    games = {}
-    for pb in pbs:
-        # Get game info from embedded data
-        game_data = pb.get("game", {}).get("data", {})
-        game_id = game_data.get("id", "unknown")
-        game_name = game_data.get("names", {}).get("international", "Unknown Game")
-        
-        # Filter by game name if specified
-        if game and game.lower() not in game_name.lower():
-            continue
-            
-        if game_id not in games:
-            games[game_id] = {
-                "name": game_name,
-                "runs": []
-            }
-        
-        # Get category name from embedded data
-        category_data = pb.get("category", {}).get("data", {})
-        category_name = category_data.get("name", "Unknown Category")
-        
-        # Check if this is a level run (individual level) or a full-game run
-        level_data = pb.get("level", {}).get("data", {})
-        level_info = ""
-        if level_data:
-            level_name = level_data.get("name", "Unknown Level")
-            level_info = f" (Level: {level_name})"
-        
-        # Format the run information
-        place = pb.get("place", 0)
-        time = format_time(pb["run"].get("times", {}).get("primary"))
-        date = pb["run"].get("date", "Unknown date")
-        run_link = pb["run"].get("weblink", "")
-        
-        games[game_id]["runs"].append({
-            "category": category_name,
-            "level": level_info,
-            "place": place,
-            "time": time,
-            "date": date,
-            "link": run_link
-        })
+    # Games are already grouped and sorted by name; filter by game name if specified
+    sorted_games = records.games
+    if game:
+        sorted_games = [group for group in sorted_games if game.lower() in group.name.lower()]
     
     # Check if any runs match the filter
-    if game and not games:
+    if game and not sorted_games:
         await interaction.followup.send(f"No personal bests found for {user_name} in games matching '{game}'")
         return
     
-    # Sort games by name
-    sorted_games = dict(sorted(games.items(), key=lambda x: x[1]["name"]))
-    
-    # Maximum number of messages to send
-    MAX_MESSAGES = 5
-    
     # Maximum runs to show per game if not showing all
     DEFAULT_RUNS_PER_GAME = 5
     
-    # Maximum fields per embed
-    MAX_FIELDS_PER_EMBED = 25
-    
-    # Track how many messages we've sent
-    message_count = 0
-    
-    # Prepare a list to hold content for each message
-    embeds_to_send = []
-    
-    # Create the main overview embed
-    overview_embed = discord.Embed(
-        title=f"Personal Bests for {user_name}",
-        color=discord.Color.gold(),
-        url=f"https://www.speedrun.com/users/{user_name}",
-        description=f"Found PBs in {len(sorted_games)} games." + 
-                    (f" Filtered by game: '{game}'" if game else "")
-    )
-    embeds_to_send.append(overview_embed)
+    # Games per page; each field can hold ~1000 characters and an embed 6000 in total
+    GAMES_PER_PAGE = 5
     
-    # Process each game
-    field_count = 0
-    for game_id, game_data in sorted_games.items():
-        game_name = game_data["name"]
-        
-        # Sort runs by place
-        sorted_runs = sorted(game_data["runs"], key=lambda x: (x["place"] if isinstance(x["place"], int) else 999))
-        
+    def game_field(game_data):
+        sorted_runs = game_data.records
         runs_text = ""
         # Determine how many runs to show
         display_count = len(sorted_runs) if showall else min(DEFAULT_RUNS_PER_GAME, len(sorted_runs))
         
         for run in sorted_runs[:display_count]:
-            emoji = "🥇" if run["place"] == 1 else "🥈" if run["place"] == 2 else "🥉" if run["place"] == 3 else f"#{run['place']}"
-            run_line = f"**{run['category']}{run['level']}**: {emoji} {run['time']} ([Link]({run['link']}))\n"
+            level = f" (Level: {run.level})" if run.level else ""
+            run_line = f"**{run.category}{level}**: {run.place_emoji} {run.time} ([Link]({run.link}))\n"
             
             # Check if adding this line would exceed Discord's field value limit
             if len(runs_text) + len(run_line) > 1000:
@@ -353,91 +242,100 @@ async def get_pbs(interaction: discord.Interaction, player: str, game: str = Non
         
         if not showall and len(sorted_runs) > DEFAULT_RUNS_PER_GAME:
             runs_text += f"*...and {len(sorted_runs) - DEFAULT_RUNS_PER_GAME} more categories*\n"
-        
-        # If this field would put us over the limit, create a new embed
-        if field_count >= MAX_FIELDS_PER_EMBED:
-            # Check if we've hit our message limit
-            if len(embeds_to_send) >= MAX_MESSAGES:
-                # We can't add any more embeds, so add a note to the last embed
-                embeds_to_send[-1].add_field(
-                    name="Message Limit Reached",
-                    value=f"There are more games not shown due to the message limit. Try filtering by game name.",
-                    inline=False
-                )
-                break
-                
-            # Create a new embed for overflow
-            new_overview = discord.Embed(
-                title=f"Personal Bests for {user_name} (continued)",
-                color=discord.Color.gold(),
-                url=f"https://www.speedrun.com/users/{user_name}"
-            )
-            embeds_to_send.append(new_overview)
-            field_count = 0
-            overview_embed = new_overview
-        
-        # Add the field to the current embed
-        overview_embed.add_field(name=f"{game_name} ({len(sorted_runs)} categories)", value=runs_text, inline=False)
-        field_count += 1
+        return f"{game_data.name} ({len(sorted_runs)} categories)", runs_text
     
-    # Send the embeds (up to MAX_MESSAGES)
-    for embed in embeds_to_send[:MAX_MESSAGES]:
-        if message_count < MAX_MESSAGES:
-            await interaction.followup.send(embed=embed)
-            message_count += 1
+    def render_page(page):
+        embed = discord.Embed(
+            title=f"Personal Bests for {user_name}",
+            color=discord.Color.gold(),
+            url=f"https://www.speedrun.com/users/{user_name}",
+            description=f"Found PBs in {len(sorted_games)} games." + 
+                        (f" Filtered by game: '{game}'" if game else "")
+        )
+        for game_data in sorted_games[page * GAMES_PER_PAGE:(page + 1) * GAMES_PER_PAGE]:
+            name, value = game_field(game_data)
+            embed.add_field(name=name, value=value, inline=False)
+        return embed
     
-    # If there would have been more messages but we hit the limit, add a note
-    if len(embeds_to_send) > MAX_MESSAGES:
-        await interaction.followup.send(f"Note: Some results were omitted due to message limits. Try filtering by game name.")
-        message_count += 1
+    page_count = (len(sorted_games) + GAMES_PER_PAGE - 1) // GAMES_PER_PAGE
+    await Paginator(page_count, render_page, interaction.user.id).send(interaction)
+
+# Suggestions come from the local name index only; no request is made per keystroke
+@get_pb.autocomplete("game")
+@get_pbs.autocomplete("game")
+async def game_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=name[:100], value=name[:100]) for name in names.games.search(current)]
+
+@get_pb.autocomplete("category")
+async def category_autocomplete(interaction: discord.Interaction, current: str):
+    game = getattr(interaction.namespace, "game", None)
+    return [app_commands.Choice(name=name[:100], value=name[:100]) for name in names.search_categories(game, current)]
+
+@bot.tree.command(name="leaderboard", description="Show a speedrun.com category leaderboard")
+async def show_leaderboard(interaction: discord.Interaction, game: str, category: str):
+    await interaction.response.defer()
+    try:
+        found = await srcom.search_game(game)
+        if not found:
+            await interaction.followup.send(f"Game '{game}' not found")
+            return
+        game_id, game_name = found
+        categories = await srcom.fetch_categories(game_id)
+        # Exact name first, then the first partial match
+        wanted = category.casefold()
+        match = next((c for c in categories if c[1].casefold() == wanted), None) \
+            or next((c for c in categories if wanted in c[1].casefold()), None)
+        if match is None:
+            await interaction.followup.send(f"No full-game category matching '{category}' in {game_name}")
+            return
+        board = await leaderboards.get(game_id, match[0], game_name, match[1])
+    except srcom.FETCH_ERRORS as e:
+        await interaction.followup.send(f"Error: Error fetching data: {e}")
+        return
+
+    if not len(board):
+        await interaction.followup.send(f"No runs on the {game_name} - {match[1]} leaderboard yet")
+        return
+
+    RUNS_PER_PAGE = 20
+    updated = f"Updated <t:{int(board.fetched_at)}:R>"
+
+    def render_page(page):
+        # Times are only formatted for the pages someone actually looks at
+        lines = []
+        start, stop = page * RUNS_PER_PAGE, min(len(board), (page + 1) * RUNS_PER_PAGE)
+        for index, time_text in zip(range(start, stop), board.times(start, stop)):
+            lines.append(f"{pbs.place_emoji(board.places[index])} **{time_text}** {board.players[index]} ([Link]({board.links[index]}))")
+        return discord.Embed(
+            title=f"{board.game} - {board.category}",
+            url=board.weblink or None,
+            description=f"{updated}\n" + "\n".join(lines)[:4000],
+            color=discord.Color.gold()
+        )
+
+    page_count = (len(board) + RUNS_PER_PAGE - 1) // RUNS_PER_PAGE
+    await Paginator(page_count, render_page, interaction.user.id).send(interaction)
+
+show_leaderboard.autocomplete("game")(game_autocomplete)
+show_leaderboard.autocomplete("category")(category_autocomplete)
 
 @bot.tree.command(name="pbsummary", description="Get a summary of a player's personal bests")
 async def get_pbs_summary(interaction: discord.Interaction, player: str):
     """Gets a summary of how many games and categories a player has PBs in"""
     await interaction.response.defer()
-    data, error = fetch_player_pbs(player)
+    data, error = await tracker.get_player_pbs(player)
     
     if error:
         await interaction.followup.send(f"Error: {error}")
         return
     
     user_name = data["user_name"]
-    pbs = data["pbs"]
+    records = data["records"]
     
-    if not pbs:
+    if not records.records:
         await interaction.followup.send(f"No personal bests found for {user_name}")
         return
         
-    # Count games and categories
-    games = {}
-    total_first_places = 0
-    total_top_3 = 0
-    
-    for pb in pbs:
-        game_data = pb.get("game", {}).get("data", {})
-        game_id = game_data.get("id", "unknown")
-        game_name = game_data.get("names", {}).get("international", "Unknown Game")
-        
-        if game_id not in games:
-            games[game_id] = {
-                "name": game_name,
-                "categories": 0,
-                "first_places": 0,
-                "top_3": 0
-            }
-        
-        games[game_id]["categories"] += 1
-        
-        place = pb.get("place", 0)
-        if place == 1:
-            games[game_id]["first_places"] += 1
-            games[game_id]["top_3"] += 1
-            total_first_places += 1
-            total_top_3 += 1
-        elif place in [2, 3]:
-            games[game_id]["top_3"] += 1
-            total_top_3 += 1
-    
     # Create an embed for the summary
     embed = discord.Embed(
         title=f"Speedrun Summary for {user_name}",
@@ -448,48 +346,442 @@ async def get_pbs_summary(interaction: discord.Interaction, player: str):
     # Add overall stats
     embed.add_field(
         name="Overall Stats", 
-        value=f"**Total Games:** {len(games)}\n"
-              f"**Total Categories:** {len(pbs)}\n"
-              f"**Total World Records:** {total_first_places}\n"
-              f"**Total Podium Placements:** {total_top_3}",
+        value=f"**Total Games:** {len(records.games)}\n"
+              f"**Total Categories:** {len(records.records)}\n"
+              f"**Total World Records:** {records.first_places}\n"
+              f"**Total Podium Placements:** {records.top_3}",
         inline=False
     )
     
     # Find top games by category count
-    top_games = sorted(games.values(), key=lambda x: x["categories"], reverse=True)[:5]
+    top_games = sorted(records.games, key=lambda x: len(x.records), reverse=True)[:5]
     
     # Add top games field
     top_games_text = ""
     for game in top_games:
-        top_games_text += f"**{game['name']}**: {game['categories']} categories, {game['first_places']} WRs\n"
+        top_games_text += f"**{game.name}**: {len(game.records)} categories, {game.first_places} WRs\n"
     
     embed.add_field(name="Most Active Games", value=top_games_text, inline=False)
     
     # Find games with most world records
-    wr_games = sorted(games.values(), key=lambda x: x["first_places"], reverse=True)[:5]
-    wr_games = [g for g in wr_games if g["first_places"] > 0]
+    wr_games = sorted(records.games, key=lambda x: x.first_places, reverse=True)[:5]
+    wr_games = [g for g in wr_games if g.first_places > 0]
     
     if wr_games:
         wr_text = ""
         for game in wr_games:
-            wr_text += f"**{game['name']}**: {game['first_places']} WRs\n"
+            wr_text += f"**{game.name}**: {game.first_places} WRs\n"
         
         embed.add_field(name="Most World Records", value=wr_text, inline=False)
     
     await interaction.followup.send(embed=embed)
 
+@bot.tree.command(name="watch", description="Announce new runs of a speedrun.com game in a channel")
+async def watch(interaction: discord.Interaction, game: str, channel: discord.TextChannel):
+    if interaction.user.id not in OWNER_IDS:
+        await interaction.response.send_message("You can't do that.", ephemeral=True)
+        return
+    await interaction.response.defer()
+    try:
+        found = await srcom.fetch_game(game)
+    except srcom.FETCH_ERRORS as e:
+        await interaction.followup.send(f"Error: Error fetching data: {e}")
+        return
+    if not found:
+        await interaction.followup.send(f"Game '{game}' not found")
+        return
+    game_id, game_name = found
+    await poller.add_watch(game_id, channel.id)
+    await interaction.followup.send(f"Watching **{game_name}** (`{game_id}`) in <#{channel.id}>")
+
+@bot.tree.command(name="unwatch", description="Stop announcing new runs of a game in a channel")
+async def unwatch(interaction: discord.Interaction, game_id: str, channel: discord.TextChannel):
+    if interaction.user.id not in OWNER_IDS:
+        await interaction.response.send_message("You can't do that.", ephemeral=True)
+        return
+    await poller.remove_watch(game_id, channel.id)
+    await interaction.response.send_message(f"Stopped watching `{game_id}` in <#{channel.id}>")
+
+@bot.tree.command(name="watchlist", description="Show watched games and how far behind their polls are")
+async def watchlist(interaction: discord.Interaction):
+    if not poller.watches:
+        await interaction.response.send_message("No games are being watched")
+        return
+    now, wall_now = time.monotonic(), time.time()
+    # The worker process publishes its scheduler state to the database every few seconds
+    status = await database.get_poll_status() if POLLER_MODE == "worker" else {}
+    lines = []
+    for watch in sorted(poller.watches.values(), key=lambda w: w.game_id):
+        channels = ", ".join(f"<#{channel_id}>" for channel_id in sorted(watch.channel_ids))
+        if POLLER_MODE == "worker":
+            if watch.game_id not in status:
+                lines.append(f"`{watch.game_id}` → {channels}: not picked up by the worker yet")
+                continue
+            interval, lag, last_poll, last_error, updated_at = status[watch.game_id]
+            last = f"{wall_now - last_poll:.0f}s ago" if last_poll else "never"
+            line = f"`{watch.game_id}` → {channels}: polled {last}, every {interval:.0f}s, lag {lag:.1f}s (as of {wall_now - updated_at:.0f}s ago)"
+        else:
+            last = f"{now - watch.last_poll:.0f}s ago" if watch.last_poll else "never"
+            line = f"`{watch.game_id}` → {channels}: polled {last}, every {watch.interval:.0f}s, lag {watch.lag(now):.1f}s"
+            last_error = watch.last_error
+        if last_error:
+            line += " ⚠️"
+        lines.append(line)
+    embed = discord.Embed(title="Watched Games", description="\n".join(lines)[:4000], color=discord.Color.gold())
+    await interaction.response.send_message(embed=embed)
+
+@bot.tree.command(name="track", description="Announce a runner's new personal bests in a channel")
+@app_commands.default_permissions(manage_guild=True)
+async def track(interaction: discord.Interaction, player: str, channel: discord.TextChannel):
+    await interaction.response.defer()
+    try:
+        user_name = await tracker.track(player, channel.id)
+    except srcom.FETCH_ERRORS as e:
+        await interaction.followup.send(f"Error: Error fetching data: {e}")
+        return
+    if user_name is None:
+        await interaction.followup.send(f"Player '{player}' not found")
+        return
+    await interaction.followup.send(f"Tracking **{user_name}**'s PBs in <#{channel.id}>")
+
+@bot.tree.command(name="untrack", description="Stop announcing a runner's new personal bests in a channel")
+@app_commands.default_permissions(manage_guild=True)
+async def untrack(interaction: discord.Interaction, player: str, channel: discord.TextChannel):
+    await interaction.response.defer()
+    try:
+        removed = await tracker.untrack(player, channel.id)
+    except srcom.FETCH_ERRORS as e:
+        await interaction.followup.send(f"Error: Error fetching data: {e}")
+        return
+    if not removed:
+        await interaction.followup.send(f"'{player}' is not tracked in <#{channel.id}>")
+        return
+    await interaction.followup.send(f"Stopped tracking '{player}' in <#{channel.id}>")
+
+@bot.tree.command(name="tracked", description="Show which runners' PBs are announced where")
+@app_commands.guild_only()
+async def tracked(interaction: discord.Interaction):
+    # Other guilds' channels are none of this guild's business
+    runners = [runner for runner in await database.get_tracked_runners() if interaction.guild.get_channel(runner[1]) is not None]
+    if not runners:
+        await interaction.response.send_message("No runners are being tracked")
+        return
+    lines = [f"**{user_name}** → <#{channel_id}>" for _, channel_id, user_name in sorted(runners, key=lambda r: r[2].lower())]
+    embed = discord.Embed(title="Tracked Runners", description="\n".join(lines)[:4000], color=discord.Color.gold())
+    await interaction.response.send_message(embed=embed)
+
+@bot.tree.command(name="starboardstats", description="Show starboard queue depth and processing latency")
+async def starboard_stats(interaction: discord.Interaction):
+    messages, jobs = starboard.queue_depth()
+    stats = starboard.queue_stats
+    processed = stats["processed"] or 1
+    flushes = starboard.flush_stats
+    await interaction.response.send_message(
+        f"**Queue:** {jobs} jobs for {messages} messages, {len(starboard.pending)} updates waiting to flush\n"
+        f"**Processed:** {stats['processed']} ({stats['errors']} errors)\n"
+        f"**Latency:** {stats['wait_total'] / processed * 1000:.0f}ms avg wait, "
+        f"{stats['run_total'] / processed * 1000:.0f}ms avg run, {stats['max_run'] * 1000:.0f}ms max run\n"
+        f"**Flushes:** {flushes['flushes']} absorbing {flushes['events']} events (max {flushes['max_absorbed']})"
+    )
+
+starboard_group = app_commands.Group(
+    name="starboard",
+    description="Configure this server's starboard",
+    guild_only=True,
+    default_permissions=discord.Permissions(manage_guild=True)
+)
+
+@starboard_group.command(name="threshold", description="Set how many reactions put a message on the board")
+async def set_board_threshold(interaction: discord.Interaction, count: app_commands.Range[int, 1, 1000]):
+    await settings.update(interaction.guild_id, threshold=count)
+    await interaction.response.send_message(f"Starboard threshold set to {count}")
+
+@starboard_group.command(name="emoji", description="Set the custom emoji that stars a message")
+async def set_board_emoji(interaction: discord.Interaction, emoji: str):
+    partial = discord.PartialEmoji.from_str(emoji.strip())
+    if partial.id is None:
+        await interaction.response.send_message("Please use a custom emoji.", ephemeral=True)
+        return
+    await settings.update(interaction.guild_id, emoji_id=partial.id)
+    await interaction.response.send_message(f"Starboard emoji set to {format_star_emoji(partial.id)}")
+
+@starboard_group.command(name="channel", description="Set the channel starred messages are posted to")
+async def set_board_channel(interaction: discord.Interaction, channel: discord.TextChannel):
+    await settings.update(interaction.guild_id, board_channel_id=channel.id)
+    await interaction.response.send_message(f"Starboard channel set to <#{channel.id}>")
+
+@starboard_group.command(name="ignore", description="Toggle whether reactions in a channel count")
+async def toggle_ignored_channel(interaction: discord.Interaction, channel: discord.TextChannel):
+    ignored = set(settings.get(interaction.guild_id).ignored_channels)
+    if channel.id in ignored:
+        ignored.remove(channel.id)
+        message = f"Reactions in <#{channel.id}> count again"
+    else:
+        ignored.add(channel.id)
+        message = f"Ignoring reactions in <#{channel.id}>"
+    await settings.update(interaction.guild_id, ignored_channels=ignored)
+    await interaction.response.send_message(message)
+
+@starboard_group.command(name="settings", description="Show this server's starboard settings")
+async def show_board_settings(interaction: discord.Interaction):
+    config = settings.get(interaction.guild_id)
+    emoji_id = star_emoji_id(interaction.guild_id)
+    board = get_board_channel(interaction.guild)
+    ignored = ", ".join(f"<#{channel_id}>" for channel_id in sorted(config.ignored_channels)) or "None"
+    await interaction.response.send_message(
+        f"**Threshold:** {config.threshold}\n"
+        f"**Emoji:** {format_star_emoji(emoji_id) if emoji_id else 'Not set'}\n"
+        f"**Channel:** {f'<#{board.id}>' if board else 'Not set'}\n"
+        f"**Ignored channels:** {ignored}"
+    )
+
+bot.tree.add_command(starboard_group)
+
+@bot.tree.command(name="topauthors", description="Show whose messages collected the most stars")
+@app_commands.guild_only()
+async def top_authors(interaction: discord.Interaction):
+    rows = await database.get_top_authors(interaction.guild_id, 10)
+    if not rows:
+        await interaction.response.send_message("Nothing has been starred yet")
+        return
+    lines = [f"**{i}.** <@{author_id}>: {stars} stars on {messages} messages" for i, (author_id, messages, stars) in enumerate(rows, 1)]
+    embed = discord.Embed(title="Top Starred Authors", description="\n".join(lines), color=discord.Color.gold())
+    await interaction.response.send_message(embed=embed, allowed_mentions=discord.AllowedMentions.none())
+
+@bot.tree.command(name="topmessages", description="Show this week's most starred messages")
+@app_commands.guild_only()
+async def top_messages(interaction: discord.Interaction):
+    # Whole days, the granularity of the daily_top and daily_stars aggregates
+    first_day = int((datetime.now(timezone.utc) - timedelta(days=7)).timestamp()) // 86400 + 1
+    rows = await database.get_top_messages_since_day(interaction.guild_id, first_day, 10)
+    if not rows:
+        await interaction.response.send_message("Nothing has been starred this week")
+        return
+    messages, stars = await database.get_stars_since_day(interaction.guild_id, first_day)
+    lines = [
+        f"**{i}.** {count} stars by <@{author_id}> in <#{channel_id}> ([Jump](https://discord.com/channels/{interaction.guild_id}/{channel_id}/{message_id}))"
+        for i, (message_id, channel_id, author_id, count) in enumerate(rows, 1)
+    ]
+    embed = discord.Embed(title="Top Messages This Week", description="\n".join(lines), color=discord.Color.gold())
+    embed.set_footer(text=f"{messages} messages starred with {stars} stars in the last 7 days")
+    await interaction.response.send_message(embed=embed, allowed_mentions=discord.AllowedMentions.none())
+
+@bot.tree.command(name="channelstats", description="Show starboard stats for a channel, or the top channels")
+@app_commands.guild_only()
+async def channel_stats(interaction: discord.Interaction, channel: discord.TextChannel = None):
+    if channel is not None:
+        row = await database.get_channel_stars(interaction.guild_id, channel.id)
+        messages, stars = row if row else (0, 0)
+        await interaction.response.send_message(f"<#{channel.id}>: {stars} stars on {messages} starred messages")
+        return
+    rows = await database.get_top_channels(interaction.guild_id, 10)
+    if not rows:
+        await interaction.response.send_message("Nothing has been starred yet")
+        return
+    lines = [f"**{i}.** <#{channel_id}>: {stars} stars on {messages} messages" for i, (channel_id, messages, stars) in enumerate(rows, 1)]
+    embed = discord.Embed(title="Top Starred Channels", description="\n".join(lines), color=discord.Color.gold())
+    await interaction.response.send_message(embed=embed)
+
 @bot.command(name="sync")
 async def sync(ctx):
-    if ctx.author.id in [1246624937066758167, 997270873847382126]:
+    if ctx.author.id in OWNER_IDS:
         await ctx.send("Syncing...")
         await bot.tree.sync()
         await ctx.send("Synced!")
 
+@bot.command(name="backfill")
+async def backfill(ctx, days: int = BACKFILL_DEFAULT_DAYS, mode: str = "resume"):
+    """Reconcile the board with the last `days` of channel history; `restart` ignores saved progress"""
+    if ctx.author.id not in OWNER_IDS or ctx.guild is None:
+        return
+    guild = ctx.guild
+    if mode == "restart":
+        await database.clear_backfill_checkpoints(guild.id)
+    board = get_board_channel(guild)
+    if board is None:
+        await ctx.send("No starboard channel found.")
+        return
+    ignored = settings.get(guild.id).ignored_channels
+    channels = [
+        channel for channel in guild.text_channels
+        if channel != board and channel.id not in ignored and channel.permissions_for(guild.me).read_message_history
+    ]
+    start_id = discord.utils.time_snowflake(datetime.now(timezone.utc) - timedelta(days=days))
+    progress = await ctx.send(f"Backfilling {len(channels)} channels...")
+    totals = {"messages": 0, "posted": 0, "updated": 0, "removed": 0}
+    started = time.monotonic()
+
+    for done, channel in enumerate(channels, 1):
+        # Resume after the last page that was fully applied
+        after_id = max(start_id, await database.get_backfill_checkpoint(channel.id) or 0)
+        page = []
+        # Once a page has a failed job, later checkpoints would skip it on resume
+        complete = True
+        try:
+            async for message in channel.history(limit=None, after=discord.Object(id=after_id), oldest_first=True):
+                page.append(message)
+                if len(page) >= BACKFILL_PAGE_SIZE:
+                    complete = await reconcile_page(guild, channel, page, after_id, page[-1].id, totals) and complete
+                    after_id = page[-1].id
+                    if complete:
+                        await database.set_backfill_checkpoint(channel.id, guild.id, after_id)
+                    page = []
+        except discord.HTTPException as e:
+            await ctx.send(f"Skipping <#{channel.id}>: {e}")
+            continue
+        # Board entries after the newest remaining message belong to deleted messages
+        now_id = discord.utils.time_snowflake(datetime.now(timezone.utc))
+        complete = await reconcile_page(guild, channel, page, after_id, now_id, totals) and complete
+        if page and complete:
+            await database.set_backfill_checkpoint(channel.id, guild.id, page[-1].id)
+
+        elapsed = time.monotonic() - started
+        await progress.edit(content=(
+            f"Backfilling: {done}/{len(channels)} channels, {totals['messages']} messages "
+            f"({totals['messages'] / elapsed:.0f}/s), {totals['posted']} posted, "
+            f"{totals['updated']} updated, {totals['removed']} removed"
+        ))
+
+    await starboard.flush_all()
+    elapsed = time.monotonic() - started
+    await ctx.send(
+        f"Backfill done: {totals['messages']} messages in {elapsed:.0f}s ({totals['messages'] / max(elapsed, 0.001):.0f}/s), "
+        f"{totals['posted']} posted, {totals['updated']} updated, {totals['removed']} removed"
+    )
+
+async def reconcile_page(guild, channel, messages, after_id, before_id, totals):
+    """Bring board entries for one page of history in line with the reactions it already contains.
+
+    Waits for the page's board jobs and returns whether all of them succeeded.
+    """
+    threshold = settings.get(guild.id).threshold
+    emoji_id = star_emoji_id(guild.id)
+    board = get_board_channel(guild)
+    seen = {}
+    count_updates = {}
+    removals = []
+    posts = []
+    for message in messages:
+        seen[message.id] = message
+        # Live handlers own messages that have updates in flight
+        if message.author == bot.user or starboard.is_busy(message.id):
+            continue
+        reaction = discord.utils.find(lambda r: getattr(r.emoji, "id", None) == emoji_id, message.reactions)
+        reaction_count = reaction.count if reaction else 0
+        starred = starboard.get(message.id)
+        if starred is None:
+            if reaction_count >= threshold:
+                posts.append(starboard.submit(message.id, functools.partial(handle_star_board, reaction, None, message)))
+                totals["posted"] += 1
+        elif reaction_count < threshold:
+            removals.append(message.id)
+        elif reaction_count != starred[2]:
+            count_updates[message.id] = reaction_count
+    for message_id in await database.get_starred_in_range(channel.id, after_id, before_id):
+        if message_id not in seen and not starboard.is_busy(message_id):
+            removals.append(message_id)
+
+    # Index and database writes happen inside each message's job, so live updates queued later can't be overwritten
+    edits = []
+    for message_id, reaction_count in count_updates.items():
+        content = board_entry_text(reaction_count, emoji_id, channel.id, seen[message_id].author.id)
+        edits.append(starboard.submit(message_id, functools.partial(update_board_entry, board, message_id, content, reaction_count)))
+    # Like the live path, an entry is only forgotten once its board messages are gone
+    deletes = [starboard.submit(message_id, functools.partial(remove_board_entry, board, message_id)) for message_id in removals]
+    results = await asyncio.gather(*posts, *edits, *deletes)
+
+    totals["messages"] += len(messages)
+    totals["updated"] += len(count_updates)
+    totals["removed"] += len(removals)
+    return all(results)
+
+def histogram_lines(name, label):
+    """One line per label value of a histogram: count, p50 and p99"""
+    lines = []
+    for (metric, labels), histogram in sorted(metrics.histograms.items(), key=lambda item: -item[1].count):
+        if metric == name:
+            value = dict(labels).get(label, "-")
+            lines.append(f"`{value}` {histogram.count}× p50 {histogram.quantile(0.5) * 1000:g}ms p99 {histogram.quantile(0.99) * 1000:g}ms")
+    return "\n".join(lines[:10]) or "No samples yet"
+
+@bot.tree.command(name="stats", description="Show command, request, database and event latencies")
+async def stats(interaction: discord.Interaction):
+    if interaction.user.id not in OWNER_IDS:
+        await interaction.response.send_message("You can't do that.", ephemeral=True)
+        return
+    caches = srcom.cache_stats()
+    messages, jobs = starboard.queue_depth()
+    embed = discord.Embed(title="Bot Stats", color=discord.Color.gold())
+    embed.add_field(name="Commands", value=histogram_lines("command_seconds", "command")[:1024], inline=False)
+    embed.add_field(name="speedrun.com", value=histogram_lines("srcom_request_seconds", "endpoint")[:1024], inline=False)
+    embed.add_field(name="Database", value=histogram_lines("db_call_seconds", "function")[:1024], inline=False)
+    embed.add_field(name="Events", value=histogram_lines("event_seconds", "event")[:1024], inline=False)
+    embed.add_field(
+        name="Caches",
+        value=(
+            f"requests {caches['requests']}, retries {caches['retries']}, coalesced {caches['coalesced']}, "
+            f"revalidated {caches['revalidated']}, breaker {caches['breaker']}\n"
+            + "\n".join(
+                f"{name}: {cache['size']}/{cache['maxsize']} entries, {cache['hits']} hits, {cache['misses']} misses"
+                for name, cache in (("users", caches["users"]), ("pbs", caches["pbs"]), ("validators", caches["validators"]))
+            )
+        )[:1024],
+        inline=False
+    )
+    embed.add_field(name="Starboard queue", value=f"{jobs} jobs for {messages} messages, {len(starboard.pending)} pending", inline=False)
+    board_stats = leaderboards.board_stats
+    embed.add_field(
+        name="Leaderboards",
+        value=f"{len(leaderboards.boards)} cached, {board_stats['fresh']} fresh hits, {board_stats['stale']} stale hits, "
+              f"{board_stats['fetched']} fetched, {board_stats['refreshed']} refreshed ({board_stats['refresh_errors']} failed)",
+        inline=False
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="memory", description="Show the bot's memory use and cache sizes")
+async def memory(interaction: discord.Interaction):
+    if interaction.user.id not in OWNER_IDS:
+        await interaction.response.send_message("You can't do that.", ephemeral=True)
+        return
+    rss = metrics.resident_bytes()
+    members = sum(len(guild.members) for guild in bot.guilds)
+    channels = sum(len(guild.channels) for guild in bot.guilds)
+    lines = [
+        f"**Resident memory:** {f'{rss / 1048576:.1f} MiB' if rss is not None else 'unavailable'}"
+        f" ({'low-memory' if LOW_MEMORY else 'default'} profile, {bot.shard_count or 1} shards)",
+        f"**Discord cache:** {len(bot.guilds)} guilds, {channels} channels, {members} members, {len(bot.users)} users, "
+        f"{len(bot.emojis)} emojis, {len(bot.cached_messages)}/{MAX_MESSAGES} messages",
+        f"**Starboard:** {len(starboard.index)} board entries, {len(starboard.pending)} pending updates",
+        f"**speedrun.com:** {len(srcom.user_cache)} users, {len(srcom.pbs_cache)} PB lists, {len(srcom.validator_cache)} validators, "
+        f"{len(tracker.snapshot_cache)} PB snapshots",
+        f"**Durations:** {duration.format_ms.cache_info().currsize} formatted, {duration.parse_ms.cache_info().currsize} parsed"
+    ]
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+@bot.event
+async def on_app_command_completion(interaction, command):
+    started = interaction.extras.get("started")
+    if started is not None:
+        metrics.observe("command_seconds", time.perf_counter() - started, command=command.qualified_name)
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started = time.perf_counter()
+
+@bot.after_invoke
+async def stop_command_timer(ctx):
+    # Called whether or not the command raised
+    name = f"!{ctx.command.qualified_name}"
+    metrics.observe("command_seconds", time.perf_counter() - ctx.started, command=name)
+    if ctx.command_failed:
+        metrics.inc("command_errors_total", command=name)
+
 @bot.tree.command(name="ping", description="ping command")
 async def ping(interaction: discord.Interaction):
     await interaction.response.send_message("PONG")
 
 @bot.event
+@metrics.instrument_event
 async def on_message(message):
     if bot.user.mentioned_in(message) and message.author != bot.user:
         if message.author.id in [1246624937066758167, 997270873847382126]:
@@ -504,34 +796,104 @@ async def on_message(message):
                 await message.add_reaction(emoji)
     await bot.process_commands(message)
 
+def get_board_channel(guild):
+    """Resolve the guild's board channel, scanning the channel list only on a cache miss"""
+    config = settings.get(guild.id)
+    if config.board_channel_id:
+        return guild.get_channel(config.board_channel_id)
+    if guild.id in board_channel_ids:
+        channel_id = board_channel_ids[guild.id]
+        return guild.get_channel(channel_id) if channel_id else None
+    channel = discord.utils.get(guild.text_channels, name="appelboard")
+    board_channel_ids[guild.id] = channel.id if channel else None
+    return channel
+
+@bot.event
+@metrics.instrument_event
+async def on_guild_channel_create(channel):
+    board_channel_ids.pop(channel.guild.id, None)
+
+@bot.event
+@metrics.instrument_event
+async def on_guild_channel_delete(channel):
+    board_channel_ids.pop(channel.guild.id, None)
+
+@bot.event
+@metrics.instrument_event
+async def on_guild_channel_update(before, after):
+    if before.name != after.name:
+        board_channel_ids.pop(after.guild.id, None)
+
+def star_emoji_id(guild_id):
+    """The guild's configured star emoji, falling back to the bot-wide appel emoji"""
+    config = settings.get(guild_id)
+    if config.emoji_id:
+        return config.emoji_id
+    return appel_emoji.id if appel_emoji else None
+
+def is_star_emoji(guild_id, emoji):
+    return emoji.id is not None and emoji.id == star_emoji_id(guild_id)
+
+def find_star_reaction(message):
+    emoji_id = star_emoji_id(message.guild.id)
+    return discord.utils.find(lambda r: getattr(r.emoji, "id", None) == emoji_id, message.reactions)
+
+def format_star_emoji(emoji_id):
+    emoji = bot.get_emoji(emoji_id)
+    return str(emoji) if emoji else f"<:appel:{emoji_id}>"
+
+def board_entry_text(reaction_count, emoji_id, channel_id, author_id):
+    return f"{reaction_count} {format_star_emoji(emoji_id)} in <#{channel_id}> by (<@{author_id}>)"
+
+async def delete_board_entry(starboard_channel, starred):
+    """Delete both board messages of an entry, ignoring ones already gone"""
+    for board_message_id in starred[:2]:
+        try:
+            await starboard_channel.get_partial_message(board_message_id).delete()
+        except discord.NotFound:
+            pass
+
+async def update_board_entry(starboard_channel, message_id, content, reaction_count):
+    """Edit an entry's star message, then store its new count"""
+    starred = starboard.get(message_id)
+    if starred:
+        await starboard_channel.get_partial_message(starred[0]).edit(content=content)
+        await starboard.update_count(message_id, reaction_count)
+
+async def remove_board_entry(starboard_channel, message_id):
+    """Delete an entry's board messages, then drop it from the index and database"""
+    starred = starboard.get(message_id)
+    if starred:
+        await delete_board_entry(starboard_channel, starred)
+        await starboard.remove(message_id)
+
 @bot.event
 async def handle_star_board(reaction, user,message):
 
-    if user.bot:
+    if user is not None and user.bot:
         return
+    config = settings.get(message.guild.id)
+    emoji_id = star_emoji_id(message.guild.id)
     if reaction != None:
-        if reaction.emoji != appel_emoji:
+        if getattr(reaction.emoji, "id", None) != emoji_id:
             return
         if message.author == bot.user:
             return
-    edit_message = False
-    if database.get_starred_message(message.id):
-        edit_message = True
+    starred = starboard.get(message.id)
+    edit_message = starred is not None
     
     channel = message.channel
     guild = channel.guild
-    reaction_count = 0
-    for the_reaction in message.reactions:
-        if str(the_reaction.emoji) == str(appel_emoji):  # Compare emoji by string or ID
-            reaction_count = reaction.count
-    print(f"✅ count: {reaction_count}")
+    reaction_count = reaction.count if reaction else 0
+    log.debug("event=star_count message_id=%s count=%s", message.id, reaction_count)
     
-    starboard_channel = discord.utils.get(guild.text_channels, name="appelboard")
-    if reaction_count >= 4:
-        m1=f"{reaction_count} <:appel:{appel_emoji.id}> in <#{message.channel.id}> by (<@{message.author.id}>)"
+    starboard_channel = get_board_channel(guild)
+    if reaction_count >= config.threshold:
+        m1=board_entry_text(reaction_count, emoji_id, message.channel.id, message.author.id)
         if edit_message:
-            star_message = await starboard_channel.fetch_message(database.get_starred_message(message.id)[1])
+            star_message = starboard_channel.get_partial_message(starred[0])
             await star_message.edit(content=m1)
+            await starboard.update_count(message.id, reaction_count)
             return
         
         star_message= await starboard_channel.send(m1)
@@ -546,46 +908,85 @@ async def handle_star_board(reaction, user,message):
             embed.set_image(url=reaction.message.attachments[0].url)
 
         f1 = await starboard_channel.send(embed=embed)
-        database.remove_starred_message(message.id)
-        database.add_starred_message(message.id, star_message.id, f1.id, channel.id, guild.id, message.author.id, reaction_count)
+        await starboard.add(message.id, star_message.id, f1.id, channel.id, guild.id, message.author.id, reaction_count)
     else:
         if edit_message:
-            star_message = await starboard_channel.fetch_message(database.get_starred_message(message.id)[1])
-            await star_message.delete()
-            star_message_2 = await starboard_channel.fetch_message(database.get_starred_message(message.id)[2])
-            await star_message_2.delete()
-            database.remove_starred_message(message.id)
+            await delete_board_entry(starboard_channel, starred)
+            await starboard.remove(message.id)
         else:
             return
 
-@bot.event  
+async def get_reaction_message(channel_id, message_id):
+    """Return a message from the client cache, fetching it only on a miss"""
+    message = discord.utils.get(bot.cached_messages, id=message_id)
+    if message is None:
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            return None
+        try:
+            message = await channel.fetch_message(message_id)
+        except discord.NotFound:
+            return None
+    return message
+
+async def flush_star_board(channel_id, message_id, update):
+    # Adds and removes that cancelled out leave the board as it was
+    if update.delta == 0:
+        return
+    message = await get_reaction_message(channel_id, message_id)
+    if message is None:
+        return
+    await handle_star_board(find_star_reaction(message), None, message)
+
+starboard.set_flush_handler(flush_star_board)
+
+@bot.event
+@metrics.instrument_event
 async def on_raw_reaction_add(payload):
-    message = await bot.get_channel(payload.channel_id).fetch_message(payload.message_id)
-    reaction = discord.utils.get(message.reactions, emoji=appel_emoji  )
-    user = await bot.fetch_user(payload.user_id)  # G
-    await handle_star_board(reaction, user,message)
+    # Decide from the payload alone whether this reaction can matter
+    if payload.guild_id is None or not is_star_emoji(payload.guild_id, payload.emoji):
+        return
+    if payload.channel_id in settings.get(payload.guild_id).ignored_channels:
+        return
+    if payload.member is not None and payload.member.bot:
+        return
+    if getattr(payload, "message_author_id", None) == bot.user.id:
+        return
+    starboard.queue_update(payload.channel_id, payload.message_id, 1)
 
-@bot.event  
+@bot.event
+@metrics.instrument_event
 async def on_raw_reaction_remove(payload):
-    if payload.emoji.id != appel_emoji.id:
+    if payload.guild_id is None or not is_star_emoji(payload.guild_id, payload.emoji):
         return
-    message = await bot.get_channel(payload.channel_id).fetch_message(payload.message_id)
-    reaction = discord.utils.get(message.reactions, emoji=appel_emoji)
-    user = await bot.fetch_user(payload.user_id)  # G
-    
-    await handle_star_board(reaction, user,message)
+    # Removing a reaction can only lower the count, so it only matters for messages on the board
+    if starboard.get(payload.message_id) is None and payload.message_id not in starboard.pending:
+        return
+    user = bot.get_user(payload.user_id)
+    if user is not None and user.bot:
+        return
+    starboard.queue_update(payload.channel_id, payload.message_id, -1)
+
 @bot.event
-async def on_message_delete(message):
-    print("D")
-    if database.get_starred_message(message.id):
-        print("D2")
-        starboard_channel = discord.utils.get(message.guild.text_channels, name="appelboard")
-        star_message = await starboard_channel.fetch_message(database.get_starred_message(message.id)[1])
-        await star_message.delete()
-        star_message_2 = await starboard_channel.fetch_message(database.get_starred_message(message.id)[2])
-        await star_message_2.delete()
-        database.remove_starred_message(message.id)
+@metrics.instrument_event
+async def on_raw_message_delete(payload):
+    # Raw, so deletions of messages that fell out of (or never were in) the message cache are seen too
+    if payload.guild_id is not None and starboard.get(payload.message_id):
+        # Queued behind any pending update for the same message
+        starboard.submit(payload.message_id, lambda: remove_deleted_message(payload.guild_id, payload.message_id))
+
+async def remove_deleted_message(guild_id, message_id):
+    starred = starboard.get(message_id)
+    guild = bot.get_guild(guild_id)
+    if starred and guild is not None:
+        log.info("event=starred_message_deleted message_id=%s", message_id)
+        await delete_board_entry(get_board_channel(guild), starred)
+        await starboard.remove(message_id)
         
         
 # === Run Bot ===
-bot.run(TOKEN)
\ No newline at end of file
+# Importing main (e.g. from benchmarks/) builds the bot without connecting
+if __name__ == "__main__":
+    # key=value messages so the logs can be grepped and parsed without a schema
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s level=%(levelname)s logger=%(name)s %(message)s")
+    bot.run(TOKEN, log_handler=None)
@@ -0,0 +1,122 @@
+import logging
+import re
+from collections import defaultdict
+from discord.ext import tasks
+import database
+
+log = logging.getLogger(__name__)
+
+# === Configuration ===
+REFRESH_INTERVAL = 10 * 60  # seconds between rebuilds from the stored PB snapshots
+MAX_CHOICES = 25  # Discord's limit for autocomplete choices
+MIN_SIMILARITY = 0.2  # trigram matches below this are typos too far gone to suggest
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize(text):
+    """Lower-case and collapse punctuation, so "Minecraft: Java Edition" matches "minecraft java" """
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameIndex:
+    """Trigram index over display names, ranked prefix > word prefix > substring > fuzzy, then by popularity"""
+    __slots__ = ("names", "weights", "_normalized", "_grams")
+
+    def __init__(self):
+        self.names = {}  # normalized -> display name
+        self.weights = defaultdict(int)  # normalized -> how many PBs use it
+        self._normalized = {}  # normalized -> trigrams
+        self._grams = defaultdict(set)  # trigram -> normalized names containing it
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, weight=1):
+        if not name:
+            return
+        key = normalize(name)
+        self.weights[key] += weight
+        if key in self.names:
+            return
+        self.names[key] = name
+        grams = self._normalized[key] = trigrams(key)
+        for gram in grams:
+            self._grams[gram].add(key)
+
+    def search(self, query, limit=MAX_CHOICES):
+        """Return up to `limit` display names for what the user has typed so far"""
+        query = normalize(query)
+        if not query:
+            keys = sorted(self.names, key=lambda key: -self.weights[key])
+            return [self.names[key] for key in keys[:limit]]
+        query_grams = trigrams(query)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for key in self._grams.get(gram, ()):
+                shared[key] += 1
+        ranked = []
+        for key, count in shared.items():
+            if key.startswith(query):
+                tier = 0
+            elif f" {query}" in f" {key}":
+                tier = 1
+            elif query in key:
+                tier = 2
+            else:
+                similarity = count / (len(query_grams) + len(self._normalized[key]) - count)
+                if similarity < MIN_SIMILARITY:
+                    continue
+                tier = 3 - similarity
+            ranked.append((tier, -self.weights[key], key))
+        ranked.sort()
+        return [self.names[key] for _, _, key in ranked[:limit]]
+
+# === Global Variables ===
+games = NameIndex()
+categories = NameIndex()  # every category, for when no game has been picked yet
+game_categories = defaultdict(NameIndex)  # normalized game name -> its categories
+
+def add_records(records):
+    """Index the game and category names of freshly fetched PBs"""
+    for record in records:
+        games.add(record.game)
+        categories.add(record.category)
+        game_categories[normalize(record.game)].add(record.category)
+
+def search_categories(game, query, limit=MAX_CHOICES):
+    """Categories of the game picked so far, or of every game when it matches none exactly"""
+    index = game_categories.get(normalize(game)) if game else None
+    return (index or categories).search(query, limit)
+
+# === Refresh ===
+def _carry_over(old, new):
+    for key, name in old.names.items():
+        if key not in new.names:
+            new.add(name, old.weights[key])
+
+async def refresh():
+    """Rebuild the indexes from every stored PB snapshot and swap them in"""
+    global games, categories, game_categories
+    new_games, new_categories, new_game_categories = NameIndex(), NameIndex(), defaultdict(NameIndex)
+    for game, category, count in await database.get_pb_names():
+        new_games.add(game, count)
+        new_categories.add(category, count)
+        new_game_categories[normalize(game)].add(category, count)
+    # Names seen only in fetches for untracked players have no snapshot; keep them
+    _carry_over(games, new_games)
+    _carry_over(categories, new_categories)
+    for key, index in game_categories.items():
+        _carry_over(index, new_game_categories[key])
+    games, categories, game_categories = new_games, new_categories, new_game_categories
+    log.info("event=names_refreshed games=%d categories=%d", len(games), len(categories))
+
+async def start():
+    if not refresh_loop.is_running():
+        refresh_loop.start()
+
+@tasks.loop(seconds=REFRESH_INTERVAL)
+async def refresh_loop():
+    await refresh()
@@ -0,0 +1,65 @@
+import logging
+import time
+import discord
+from discord.ext import tasks
+import database
+
+log = logging.getLogger(__name__)
+
+# === Configuration ===
+DELIVERY_INTERVAL = 5  # seconds between outbox checks on the gateway side
+DELIVERY_BATCH = 20
+
+# === Global Variables ===
+bot = None  # set when announcements are sent directly; None means they go to the outbox
+delivery_stats = {"delivered": 0, "dropped": 0, "max_delay": 0.0}
+
+def use_bot(client):
+    """Send announcements straight to Discord through `client`"""
+    global bot
+    bot = client
+
+async def send(channel_id, content):
+    """Announce `content` in a channel, or queue it for the gateway process when there is no bot here"""
+    if bot is None:
+        await database.add_outbox_message(channel_id, content)
+        return
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        log.warning("event=announce_channel_missing channel_id=%s", channel_id)
+        return
+    try:
+        await channel.send(content)
+    except discord.HTTPException as e:
+        # A channel the bot can't post in must not stop the loop that is announcing
+        delivery_stats["dropped"] += 1
+        log.warning("event=announce_failed channel_id=%s error=%r", channel_id, e)
+        return
+    delivery_stats["delivered"] += 1
+
+# === Outbox Delivery ===
+async def start_delivery(client):
+    """Deliver announcements queued by a separate worker process (see worker.py)"""
+    use_bot(client)
+    if not deliver_loop.is_running():
+        deliver_loop.start()
+
+@tasks.loop(seconds=DELIVERY_INTERVAL)
+async def deliver_loop():
+    for outbox_id, channel_id, content, created_at in await database.get_outbox_messages(DELIVERY_BATCH):
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            delivery_stats["dropped"] += 1
+            log.warning("event=announce_channel_missing channel_id=%s outbox_id=%s", channel_id, outbox_id)
+        else:
+            try:
+                await channel.send(content)
+            except discord.HTTPException as e:
+                # Missing permissions won't fix themselves; don't retry the same message forever
+                delivery_stats["dropped"] += 1
+                log.warning("event=announce_failed channel_id=%s outbox_id=%s error=%r", channel_id, outbox_id, e)
+            else:
+                delivery_stats["delivered"] += 1
+                delivery_stats["max_delay"] = max(delivery_stats["max_delay"], time.time() - created_at)
+        # Removed only after sending, so a crash in between repeats an announcement rather than losing it
+        await database.remove_outbox_message(outbox_id)
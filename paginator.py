@@ -0,0 +1,65 @@
+import discord
+
+# === Configuration ===
+PAGE_TIMEOUT = 300  # seconds of inactivity before the buttons are removed
+
+class Paginator(discord.ui.View):
+    """Prev/next buttons that edit one message, rendering each page only when it is first shown"""
+
+    def __init__(self, page_count, render_page, author_id, timeout=PAGE_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.page_count = page_count
+        self.render_page = render_page  # page index -> discord.Embed
+        self.author_id = author_id
+        self.page = 0
+        self.message = None
+        self._rendered = {}
+        self._update_buttons()
+
+    def current_embed(self):
+        embed = self._rendered.get(self.page)
+        if embed is None:
+            embed = self._rendered[self.page] = self.render_page(self.page)
+            if self.page_count > 1:
+                embed.set_footer(text=f"Page {self.page + 1}/{self.page_count}")
+        return embed
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+    async def send(self, interaction):
+        """Send the first page as the interaction's follow-up, with buttons only if there is more than one page"""
+        if self.page_count > 1:
+            self.message = await interaction.followup.send(embed=self.current_embed(), view=self, wait=True)
+        else:
+            self.stop()
+            await interaction.followup.send(embed=self.current_embed())
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Only the person who ran the command can turn pages.", ephemeral=True)
+            return False
+        return True
+
+    async def _show(self, interaction, page):
+        self.page = max(0, min(self.page_count - 1, page))
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.current_embed(), view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        await self._show(interaction, self.page + 1)
+
+    async def on_timeout(self):
+        # Drop the rendered pages and the buttons once nobody is paging any more
+        self._rendered.clear()
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
@@ -0,0 +1,121 @@
+import duration
+
+# === Records ===
+UNPLACED = 999  # Sort key for PBs without an integer place (e.g. unverified or obsolete boards)
+
+def place_emoji(place):
+    return "🥇" if place == 1 else "🥈" if place == 2 else "🥉" if place == 3 else f"#{place}"
+
+class PBRecord:
+    """One personal best, parsed once from the speedrun.com payload"""
+    __slots__ = ("game_id", "category_id", "level_id", "variant", "run_id", "game", "category", "level",
+                 "place", "time_ms", "time", "date", "link", "sort_key")
+
+    def __init__(self, game_id, category_id, level_id, variant, run_id, game, category, level, place, time_ms, date, link):
+        self.game_id = game_id
+        self.category_id = category_id
+        self.level_id = level_id
+        self.variant = variant  # subcategory variable values, e.g. "p85xqrvn=21d4zvp1"
+        self.run_id = run_id
+        self.game = game
+        self.category = category
+        self.level = level
+        self.place = place
+        self.time_ms = time_ms
+        self.time = None  # set by PlayerPBs, which formats every record's time in one batch
+        self.date = date
+        self.link = link
+        place_key = place if isinstance(place, int) else UNPLACED
+        self.sort_key = (place_key, time_ms if time_ms is not None else 0)
+
+    @classmethod
+    def from_payload(cls, pb):
+        game_data = pb.get("game", {}).get("data", {})
+        category_data = pb.get("category", {}).get("data", {})
+        # Level runs (individual levels) embed their level, full-game runs embed an empty list
+        level_data = pb.get("level", {}).get("data", {})
+        run = pb.get("run", {})
+        times = run.get("times", {})
+        time_ms = duration.parse_ms(times.get("primary"))
+        if time_ms is None and times.get("primary_t") is not None:
+            time_ms = round(times["primary_t"] * 1000)
+        return cls(
+            game_data.get("id", "unknown"),
+            category_data.get("id"),
+            level_data.get("id") if level_data else None,
+            ",".join(f"{variable}={value}" for variable, value in sorted((run.get("values") or {}).items())),
+            run.get("id"),
+            game_data.get("names", {}).get("international", "Unknown Game"),
+            category_data.get("name", "Unknown Category"),
+            level_data.get("name", "Unknown Level") if level_data else None,
+            pb.get("place", 0),
+            time_ms,
+            run.get("date", "Unknown date"),
+            run.get("weblink", "")
+        )
+
+    def to_row(self):
+        """Compact list form for snapshots; PBRecord(*row) rebuilds the record"""
+        return [self.game_id, self.category_id, self.level_id, self.variant, self.run_id, self.game,
+                self.category, self.level, self.place, self.time_ms, self.date, self.link]
+
+    @property
+    def key(self):
+        """Identifies the leaderboard this PB is on"""
+        return (self.game_id, self.category_id, self.level_id, self.variant)
+
+    @property
+    def place_emoji(self):
+        return place_emoji(self.place)
+
+class GamePBs:
+    """A player's records for one game, sorted by place"""
+    __slots__ = ("game_id", "name", "records", "first_places", "top_3")
+
+    def __init__(self, game_id, name):
+        self.game_id = game_id
+        self.name = name
+        self.records = []
+        self.first_places = 0
+        self.top_3 = 0
+
+class PlayerPBs:
+    """Every PB of a player, sorted by place and grouped by game (games sorted by name)"""
+    __slots__ = ("records", "games", "first_places", "top_3")
+
+    def __init__(self, records):
+        self.records = sorted(records, key=lambda record: record.sort_key)
+        for record, text in zip(self.records, duration.format_many([record.time_ms for record in self.records])):
+            record.time = text
+        games = {}
+        for record in self.records:
+            group = games.get(record.game_id)
+            if group is None:
+                group = games[record.game_id] = GamePBs(record.game_id, record.game)
+            group.records.append(record)
+            if record.place == 1:
+                group.first_places += 1
+            if record.place in (1, 2, 3):
+                group.top_3 += 1
+        self.games = sorted(games.values(), key=lambda group: group.name)
+        self.first_places = sum(group.first_places for group in self.games)
+        self.top_3 = sum(group.top_3 for group in self.games)
+
+def build(pbs_data):
+    """Normalize a personal-bests payload into a PlayerPBs"""
+    return PlayerPBs(PBRecord.from_payload(pb) for pb in pbs_data)
+
+def from_rows(rows):
+    return PlayerPBs(PBRecord(*row) for row in rows)
+
+def diff(old, new):
+    """Return (record, previous) for every PB in `new` that beats `old`; previous is None on a new leaderboard"""
+    previous = {record.key: record for record in old.records}
+    improved = []
+    for record in new.records:
+        before = previous.get(record.key)
+        if before is None:
+            improved.append((record, None))
+        elif record.run_id != before.run_id and record.time_ms is not None and (before.time_ms is None or record.time_ms < before.time_ms):
+            improved.append((record, before))
+    return improved
@@ -0,0 +1,126 @@
+import logging
+import time
+from discord.ext import tasks
+import database
+import notifier
+import srcom
+
+log = logging.getLogger(__name__)
+
+# === Configuration ===
+# Polls are paced to part of srcom's request budget; the rest is for commands
+REQUESTS_PER_MINUTE = 60
+SLOT_SECONDS = 60 / REQUESTS_PER_MINUTE
+# Per-game poll interval bounds in seconds
+POLL_MIN_INTERVAL = 10
+POLL_MAX_INTERVAL = 300
+POLL_IDLE_BACKOFF = 1.5
+POLL_ERROR_BACKOFF = 2
+
+# === Global Variables ===
+watches = {}  # game_id -> GameWatch
+
+class GameWatch:
+    """Polling state for one game and every channel announcing it"""
+
+    def __init__(self, game_id, next_poll):
+        self.game_id = game_id
+        self.channel_ids = set()
+        self.interval = POLL_MIN_INTERVAL
+        self.next_poll = next_poll
+        self.last_poll = None
+        self.last_lag = 0.0
+        self.last_error = None
+
+    def lag(self, now=None):
+        """Seconds this game is currently overdue, or the lateness of its last poll"""
+        now = time.monotonic() if now is None else now
+        return max(self.last_lag, now - self.next_poll)
+
+    def reschedule(self, interval, now):
+        self.interval = max(POLL_MIN_INTERVAL, min(POLL_MAX_INTERVAL, interval))
+        self.next_poll = now + self.interval
+
+# === Watch List ===
+async def load_watches():
+    """(Re)build the in-memory watch list from the database, staggering first polls"""
+    now = time.monotonic()
+    old = dict(watches)
+    watches.clear()
+    for game_id, channel_id in await database.get_watched_games():
+        watch = watches.get(game_id)
+        if watch is None:
+            watch = old.get(game_id) or GameWatch(game_id, now + len(watches) * SLOT_SECONDS)
+            watch.channel_ids = set()
+            watches[game_id] = watch
+        watch.channel_ids.add(channel_id)
+
+async def add_watch(game_id, channel_id):
+    await database.add_watched_game(game_id, channel_id)
+    await load_watches()
+
+async def remove_watch(game_id, channel_id):
+    await database.remove_watched_game(game_id, channel_id)
+    await load_watches()
+
+async def start():
+    await load_watches()
+    if not scheduler.is_running():
+        scheduler.start()
+
+# === Polling ===
+async def poll_game(watch):
+    now = time.monotonic()
+    watch.last_lag = max(0.0, now - watch.next_poll)
+    watermark = await database.get_run_watermark(watch.game_id)
+    last_run_id, last_submitted = watermark if watermark else (None, None)
+    try:
+        runs = await srcom.fetch_runs_since(watch.game_id, last_run_id, last_submitted)
+    except srcom.FETCH_ERRORS as e:
+        watch.last_error = repr(e)
+        log.warning("event=poll_failed game=%s error=%r", watch.game_id, e)
+        watch.reschedule(watch.interval * POLL_ERROR_BACKOFF, time.monotonic())
+        return
+    watch.last_poll = time.monotonic()
+    watch.last_error = None
+    if not runs:
+        watch.reschedule(watch.interval * POLL_IDLE_BACKOFF, watch.last_poll)
+        return
+
+    if last_run_id is None:
+        # First poll for this game: remember where we are instead of announcing old runs
+        await database.set_run_watermark(watch.game_id, runs[-1].get("id"), runs[-1].get("submitted"))
+        watch.reschedule(watch.interval, watch.last_poll)
+        return
+
+    for run in runs:
+        link = run.get("weblink", "No link available")
+        for channel_id in watch.channel_ids:
+            await notifier.send(channel_id, f"🎉 **New Run!**\n{link}")
+        await database.set_run_watermark(watch.game_id, run.get("id"), run.get("submitted"))
+    watch.reschedule(POLL_MIN_INTERVAL, watch.last_poll)
+
+async def publish_status():
+    """Store every watch's interval and lag, for a bot that isn't running the scheduler itself"""
+    now, wall_now = time.monotonic(), time.time()
+    await database.set_poll_status([
+        (watch.game_id, watch.interval, watch.lag(now),
+         None if watch.last_poll is None else wall_now - (now - watch.last_poll), watch.last_error)
+        for watch in watches.values()
+    ])
+
+@tasks.loop(seconds=SLOT_SECONDS)
+async def scheduler():
+    """Poll at most one due game per slot; srcom's token bucket enforces the global budget"""
+    now = time.monotonic()
+    due = [watch for watch in watches.values() if watch.next_poll <= now]
+    if not due:
+        return
+    watch = min(due, key=lambda watch: watch.next_poll)
+    try:
+        await poll_game(watch)
+    except Exception as e:
+        # An exception escaping a tasks.loop ends it for every game; back this one off instead
+        watch.last_error = repr(e)
+        log.exception("event=poll_crashed game=%s", watch.game_id)
+        watch.reschedule(watch.interval * POLL_ERROR_BACKOFF, time.monotonic())
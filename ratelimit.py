@@ -0,0 +1,116 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+# Lower numbers are served first
+PRIORITY_COMMAND = 0
+PRIORITY_BACKGROUND = 1
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open"""
+
+class TokenBucket:
+    """Async token bucket that serves waiters by priority
+
+    Background callers only take a token when more than `reserve` are left,
+    so commands still find one when the budget is nearly spent.
+    """
+
+    def __init__(self, rate, capacity, reserve=0):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.reserve = reserve
+        self.tokens = capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds):
+        """Hold every caller back, e.g. for a Retry-After from the server"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, priority=PRIORITY_COMMAND):
+        """Wait for a token; `priority` may be a callable, re-read while waiting so a caller can be promoted"""
+        current = priority() if callable(priority) else priority
+        entry = (current, next(self._seq))
+        heapq.heappush(self._waiters, entry)
+        try:
+            while True:
+                if callable(priority) and priority() != entry[0]:
+                    # Keep the original sequence number so promotion doesn't lose the caller's place
+                    self._waiters.remove(entry)
+                    entry = (priority(), entry[1])
+                    self._waiters.append(entry)
+                    heapq.heapify(self._waiters)
+                now = time.monotonic()
+                self._refill(now)
+                needed = 1 if entry[0] == PRIORITY_COMMAND else 1 + self.reserve
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self._waiters[0] != entry:
+                    delay = 1 / self.rate
+                elif self.tokens >= needed:
+                    heapq.heappop(self._waiters)
+                    self.tokens -= 1
+                    return
+                else:
+                    delay = (needed - self.tokens) / self.rate
+                if callable(priority):
+                    # Look again soon in case the priority changes
+                    delay = min(delay, 1 / self.rate)
+                await asyncio.sleep(delay)
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+class CircuitBreaker:
+    """Stops outbound calls for a cooldown after too many consecutive failures"""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def check(self):
+        if self.state == "open":
+            raise CircuitOpenError(f"speedrun.com unavailable, retrying in {self.cooldown - (time.monotonic() - self.opened_at):.0f}s")
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold or self.state == "half-open":
+            if self.state != "open":
+                self.trips += 1
+            self.opened_at = time.monotonic()
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,54 @@
+import database
+
+# === Configuration ===
+DEFAULT_THRESHOLD = 4
+
+# === Global Variables ===
+_settings = {}  # guild_id -> GuildSettings
+_listeners = []
+
+class GuildSettings:
+    """Starboard settings for one guild; None means "use the bot-wide default\""""
+    __slots__ = ("guild_id", "threshold", "emoji_id", "board_channel_id", "ignored_channels")
+
+    def __init__(self, guild_id, threshold=DEFAULT_THRESHOLD, emoji_id=None, board_channel_id=None, ignored_channels=frozenset()):
+        self.guild_id = guild_id
+        self.threshold = threshold
+        self.emoji_id = emoji_id
+        self.board_channel_id = board_channel_id
+        self.ignored_channels = frozenset(ignored_channels)
+
+    def to_row(self):
+        ignored = ",".join(str(channel_id) for channel_id in sorted(self.ignored_channels))
+        return (self.guild_id, self.threshold, self.emoji_id, self.board_channel_id, ignored)
+
+    @classmethod
+    def from_row(cls, row):
+        guild_id, threshold, emoji_id, board_channel_id, ignored = row
+        ignored_channels = {int(channel_id) for channel_id in ignored.split(",") if channel_id} if ignored else ()
+        return cls(guild_id, threshold, emoji_id, board_channel_id, ignored_channels)
+
+# === Cache ===
+async def load():
+    _settings.clear()
+    for row in await database.get_all_guild_settings():
+        config = GuildSettings.from_row(row)
+        _settings[config.guild_id] = config
+
+def get(guild_id):
+    """Return the guild's settings from memory, with defaults for unconfigured guilds"""
+    config = _settings.get(guild_id)
+    return config if config is not None else GuildSettings(guild_id)
+
+def add_listener(listener):
+    """Call `listener(settings)` whenever a guild's settings change"""
+    _listeners.append(listener)
+
+async def update(guild_id, **changes):
+    current = get(guild_id)
+    config = GuildSettings(guild_id, **{name: changes.get(name, getattr(current, name)) for name in GuildSettings.__slots__[1:]})
+    _settings[guild_id] = config
+    await database.set_guild_settings(*config.to_row())
+    for listener in _listeners:
+        listener(config)
+    return config
@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import os
+import time
+import aiohttp
+import metrics
+import pbs
+from cache import TTLCache
+from ratelimit import PRIORITY_BACKGROUND, PRIORITY_COMMAND, CircuitBreaker, CircuitOpenError, TokenBucket, backoff_delay, parse_retry_after
+
+log = logging.getLogger(__name__)
+
+# === Configuration ===
+# Point SRCOM_API_BASE at a local stand-in (see benchmarks/fake_srcom.py) to run without speedrun.com
+API_BASE = os.getenv("SRCOM_API_BASE", "https://www.speedrun.com/api/v1").rstrip("/")
+REQUEST_TIMEOUT = 5
+MAX_CONNECTIONS = 10
+USER_ID_TTL = 24 * 60 * 60
+PBS_TTL = 60
+VALIDATOR_TTL = 60 * 60
+GAME_TTL = 24 * 60 * 60  # game names and category lists
+RUNS_PAGE_SIZE = 20
+RUNS_MAX_PAGES = 5
+# Outbound budget: speedrun.com allows roughly 100 requests/minute
+REQUESTS_PER_MINUTE = 90
+BURST = 10
+COMMAND_RESERVE = 3
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30
+RATE_LIMIT_PAUSE = 60
+RATE_LIMIT_STATUSES = (420, 429)
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 60
+
+# Exceptions a failed fetch can raise
+FETCH_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError)
+
+# === Global Variables ===
+_session = None
+revalidated = 0
+coalesced = 0
+requests_sent = 0
+retries = 0
+bucket = TokenBucket(rate=REQUESTS_PER_MINUTE / 60, capacity=BURST, reserve=COMMAND_RESERVE)
+breaker = CircuitBreaker(threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN)
+# Request key -> task of the upstream fetch currently in flight
+_inflight = {}
+_inflight_priority = {}  # request key -> most urgent priority among callers sharing the in-flight fetch
+
+# === Caches ===
+# Lower-cased username -> (user_id, international name)
+user_cache = TTLCache(maxsize=2048, ttl=USER_ID_TTL)
+# user_id -> (personal-bests payload, parsed PlayerPBs)
+pbs_cache = TTLCache(maxsize=256, ttl=PBS_TTL)
+# Request key -> (etag, last_modified, body) for conditional revalidation
+validator_cache = TTLCache(maxsize=512, ttl=VALIDATOR_TTL)
+# Lower-cased game name -> (game_id, international name)
+game_cache = TTLCache(maxsize=512, ttl=GAME_TTL)
+# game_id -> [(category_id, name)] of its full-game categories
+category_cache = TTLCache(maxsize=512, ttl=GAME_TTL)
+
+# === Session ===
+def get_session():
+    """Return the shared keep-alive session, creating it on first use"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, keepalive_timeout=60, ttl_dns_cache=300)
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            headers={"User-Agent": "appel_bot"}
+        )
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def request_key(path, params=None):
+    return path + "?" + "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+
+async def get_json(path, params=None, timeout=REQUEST_TIMEOUT, revalidate=False, priority=PRIORITY_COMMAND):
+    """GET an API path and return the decoded JSON body
+
+    Every request waits for a token from the shared bucket, command requests
+    ahead of background ones, and is retried with backoff on 420/429, 5xx and
+    network errors. Concurrent calls for the same request share one upstream fetch and parse,
+    which waits at the most urgent priority among them.
+    With revalidate=True the last ETag/Last-Modified seen for this request is
+    sent back, and a 304 answer reuses the body stored alongside it.
+    """
+    global coalesced
+    key = request_key(path, params)
+    task = _inflight.get(key)
+    if task is None:
+        _inflight_priority[key] = priority
+        task = asyncio.ensure_future(_fetch_json(key, path, params, timeout, revalidate, lambda: _inflight_priority.get(key, priority)))
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _finish_inflight(key, done))
+    else:
+        coalesced += 1
+        # A command joining a background fetch must not wait behind the command reserve
+        _inflight_priority[key] = min(_inflight_priority.get(key, priority), priority)
+    # Shield so one caller giving up does not cancel the fetch for the others
+    return await asyncio.shield(task)
+
+def _finish_inflight(key, task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+        _inflight_priority.pop(key, None)
+    if not task.cancelled():
+        # Mark the exception as retrieved in case every waiter was cancelled
+        task.exception()
+
+async def _fetch_json(key, path, params, timeout, revalidate, priority):
+    global retries
+    for attempt in range(MAX_RETRIES + 1):
+        breaker.check()
+        await bucket.acquire(priority)
+        retry_after = None
+        try:
+            body = await _send_request(key, path, params, timeout, revalidate)
+        except aiohttp.ClientResponseError as e:
+            if e.status not in RATE_LIMIT_STATUSES and e.status < 500:
+                # The API is up, the request itself is bad (e.g. unknown user)
+                breaker.record_success()
+                raise
+            if e.status in RATE_LIMIT_STATUSES:
+                retry_after = parse_retry_after(e.headers.get("Retry-After") if e.headers else None)
+                bucket.pause(RATE_LIMIT_PAUSE if retry_after is None else retry_after)
+            else:
+                breaker.record_failure()
+            error = e
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            breaker.record_failure()
+            error = e
+        else:
+            breaker.record_success()
+            return body
+        if attempt == MAX_RETRIES:
+            raise error
+        retries += 1
+        metrics.inc("srcom_retries_total", endpoint=path.split("/")[0])
+        log.info("event=srcom_retry path=%s attempt=%d error=%r", path, attempt + 1, error)
+        await asyncio.sleep(backoff_delay(attempt, BACKOFF_BASE, BACKOFF_CAP) if retry_after is None else retry_after)
+
+async def _send_request(key, path, params, timeout, revalidate):
+    global requests_sent
+    session = get_session()
+    headers = {}
+    stored = validator_cache.peek(key) if revalidate else None
+    if stored:
+        etag, last_modified, _ = stored
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    requests_sent += 1
+    endpoint = path.split("/")[0]
+    start = time.perf_counter()
+    status = "error"
+    try:
+        async with session.get(f"{API_BASE}/{path}", params=params, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            status = response.status
+            return await _read_response(response, key, stored, revalidate)
+    finally:
+        metrics.observe("srcom_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+        metrics.inc("srcom_requests_total", endpoint=endpoint, status=status)
+
+async def _read_response(response, key, stored, revalidate):
+    global revalidated
+    if stored and response.status == 304:
+        revalidated += 1
+        validator_cache.set(key, stored)
+        return stored[2]
+    response.raise_for_status()
+    body = await response.json()
+    if revalidate:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            validator_cache.set(key, (etag, last_modified, body))
+    return body
+
+def cache_stats():
+    return {
+        "users": user_cache.stats(),
+        "pbs": pbs_cache.stats(),
+        "validators": validator_cache.stats(),
+        "revalidated": revalidated,
+        "coalesced": coalesced,
+        "inflight": len(_inflight),
+        "requests": requests_sent,
+        "retries": retries,
+        "breaker": breaker.state
+    }
+
+# === Endpoints ===
+async def fetch_latest_run(game_id):
+    data = await get_json("runs", params={"game": game_id, "orderby": "submitted", "direction": "desc", "max": 1})
+    return data.get("data", [None])[0] if data.get("data") else None
+
+async def fetch_game(game):
+    """Resolve a game id or abbreviation to (game_id, international name), or None"""
+    try:
+        data = (await get_json(f"games/{game}")).get("data")
+    except aiohttp.ClientResponseError as e:
+        if e.status == 404:
+            return None
+        raise
+    if not data:
+        return None
+    return data.get("id"), data.get("names", {}).get("international", game)
+
+async def search_game(name, priority=PRIORITY_COMMAND):
+    """Resolve a game name, abbreviation or id to (game_id, international name), or None"""
+    game = game_cache.get(name.lower())
+    if game is None:
+        games = (await get_json("games", params={"name": name, "max": 10}, priority=priority)).get("data", [])
+        wanted = name.casefold()
+        # The name search is fuzzy; prefer an exact name or abbreviation over its first hit
+        data = next((g for g in games if g.get("names", {}).get("international", "").casefold() == wanted
+                     or (g.get("abbreviation") or "").casefold() == wanted), games[0] if games else None)
+        if data is not None:
+            game = (data.get("id"), data.get("names", {}).get("international", name))
+        else:
+            game = await fetch_game(name)
+            if game is None:
+                return None
+        game_cache.set(name.lower(), game)
+    return game
+
+async def fetch_categories(game_id, priority=PRIORITY_COMMAND):
+    """Return [(category_id, name)] of a game's full-game categories"""
+    categories = category_cache.get(game_id)
+    if categories is None:
+        data = (await get_json(f"games/{game_id}/categories", priority=priority)).get("data", [])
+        categories = [(c.get("id"), c.get("name", "Unknown Category")) for c in data if c.get("type") == "per-game"]
+        category_cache.set(game_id, categories)
+    return categories
+
+async def fetch_leaderboard(game_id, category_id, priority=PRIORITY_COMMAND):
+    """Return the leaderboard payload of a full-game category, with its players embedded"""
+    data = await get_json(f"leaderboards/{game_id}/category/{category_id}", params={"embed": "players"}, revalidate=True, priority=priority)
+    return data.get("data", {})
+
+async def fetch_runs_since(game_id, last_run_id, last_submitted, page_size=RUNS_PAGE_SIZE, max_pages=RUNS_MAX_PAGES, priority=PRIORITY_BACKGROUND):
+    """Return runs submitted after the watermark, oldest first
+
+    Pages through runs newest first until the watermark run, or anything
+    submitted before it (the watermark run may have been deleted), shows up.
+    Without a watermark only the latest run is returned.
+    """
+    if last_run_id is None:
+        page_size = max_pages = 1
+    new_runs = []
+    for page in range(max_pages):
+        params = {"game": game_id, "orderby": "submitted", "direction": "desc", "max": page_size, "offset": page * page_size}
+        runs = (await get_json("runs", params=params, priority=priority)).get("data", [])
+        for run in runs:
+            if run.get("id") == last_run_id:
+                return new_runs[::-1]
+            if last_submitted and run.get("submitted") and run["submitted"] < last_submitted:
+                return new_runs[::-1]
+            new_runs.append(run)
+        if len(runs) < page_size:
+            break
+    return new_runs[::-1]
+
+async def lookup_user(player_name, priority=PRIORITY_COMMAND):
+    """Resolve a username to (user_id, international name), or None if there is no such user"""
+    # The user ID behind a username hardly ever changes
+    user = user_cache.get(player_name.lower())
+    if user is None:
+        user_data = (await get_json("users", params={"lookup": player_name}, priority=priority)).get("data", [])
+        if not user_data:
+            return None
+        user = (user_data[0].get("id"), user_data[0].get("names", {}).get("international", player_name))
+        user_cache.set(player_name.lower(), user)
+    return user
+
+async def fetch_user_pbs(user_id, priority=PRIORITY_COMMAND):
+    """Return (personal-bests payload, parsed PlayerPBs) for a user id"""
+    cached = pbs_cache.get(user_id)
+    if cached is None:
+        # Include game, category, and level data in the response using the embed parameter
+        pbs_data = (await get_json(f"users/{user_id}/personal-bests", params={"embed": "game,category,level"}, revalidate=True, priority=priority)).get("data", [])
+        # Parse once and keep the records next to the payload for every command
+        cached = (pbs_data, pbs.build(pbs_data))
+        pbs_cache.set(user_id, cached)
+    return cached
+
+async def fetch_player_pbs(player_name):
+    """Fetch all personal bests for a player by username"""
+    try:
+        user = await lookup_user(player_name)
+        if user is None:
+            return None, f"Player '{player_name}' not found"
+        user_id, user_name = user
+        pbs_data, records = await fetch_user_pbs(user_id)
+
+        return {
+            "user_name": user_name,
+            "pbs": pbs_data,
+            "records": records
+        }, None
+    except FETCH_ERRORS as e:
+        return None, f"Error fetching data: {str(e) or type(e).__name__}"
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from collections import deque
+import database
+
+log = logging.getLogger(__name__)
+
+# === Configuration ===
+# Reactions to one message within this many seconds become a single board update
+FLUSH_DELAY = 2.0
+# Board updates for different messages run in parallel on this many workers
+WORKERS = 4
+
+# === Global Variables ===
+# message_id -> (star_message_id, embed_message_id, reaction_count) for every message on the board
+index = {}
+# message_id -> PendingUpdate waiting to be flushed
+pending = {}
+flush_stats = {"flushes": 0, "events": 0, "last_absorbed": 0, "max_absorbed": 0}
+_flush_handler = None
+# message_id -> deque of (enqueued_at, job, done); a message is in here while it has work queued or running
+_jobs = {}
+_ready = None  # asyncio.Queue of message_ids waiting for a worker
+_workers = []
+queue_stats = {"processed": 0, "errors": 0, "wait_total": 0.0, "run_total": 0.0, "max_run": 0.0}
+
+# === Index ===
+async def load():
+    """Bulk-load the board from the database, replacing whatever is in memory"""
+    rows = await database.get_all_starred_messages()
+    index.clear()
+    for message_id, star_message_id, embed_message_id, _, _, _, reaction_count in rows:
+        index[message_id] = (star_message_id, embed_message_id, reaction_count)
+
+def get(message_id):
+    """Return (star_message_id, embed_message_id, reaction_count), or None when not starred"""
+    return index.get(message_id)
+
+# === Write-through Updates ===
+async def add(message_id, star_message_id, embed_message_id, channel_id, guild_id, author_id, reaction_count):
+    index[message_id] = (star_message_id, embed_message_id, reaction_count)
+    await database.add_starred_message(message_id, star_message_id, embed_message_id, channel_id, guild_id, author_id, reaction_count)
+
+async def update_count(message_id, reaction_count):
+    entry = index.get(message_id)
+    if entry is None or entry[2] == reaction_count:
+        return
+    index[message_id] = (entry[0], entry[1], reaction_count)
+    await database.update_reaction_count(message_id, reaction_count)
+
+async def remove(message_id):
+    if index.pop(message_id, None) is not None:
+        await database.remove_starred_message(message_id)
+
+# === Debounced Updates ===
+class PendingUpdate:
+    __slots__ = ("channel_id", "delta", "events", "task")
+
+    def __init__(self, channel_id):
+        self.channel_id = channel_id
+        self.delta = 0
+        self.events = 0
+        self.task = None
+
+def set_flush_handler(handler):
+    """Register `async handler(channel_id, message_id, update)` that applies a flushed update"""
+    global _flush_handler
+    _flush_handler = handler
+
+def queue_update(channel_id, message_id, delta):
+    """Record a reaction delta; the first one for a message schedules its flush"""
+    update = pending.get(message_id)
+    if update is None:
+        update = pending[message_id] = PendingUpdate(channel_id)
+        update.task = asyncio.create_task(_flush_later(message_id))
+    update.delta += delta
+    update.events += 1
+
+async def _flush_later(message_id):
+    await asyncio.sleep(FLUSH_DELAY)
+    await flush(message_id)
+
+async def flush(message_id):
+    update = pending.pop(message_id, None)
+    if update is None:
+        return
+    flush_stats["flushes"] += 1
+    flush_stats["events"] += update.events
+    flush_stats["last_absorbed"] = update.events
+    flush_stats["max_absorbed"] = max(flush_stats["max_absorbed"], update.events)
+    submit(message_id, lambda: _flush_handler(update.channel_id, message_id, update))
+
+async def flush_all():
+    """Flush every pending update now and wait for the work queue to drain, e.g. before shutting down"""
+    for message_id in list(pending):
+        update = pending.get(message_id)
+        if update is None:
+            continue
+        if update.task is not None and update.task is not asyncio.current_task():
+            update.task.cancel()
+        await flush(message_id)
+    if _ready is not None:
+        await _ready.join()
+
+# === Work Queue ===
+def start_workers():
+    global _ready
+    if _ready is None:
+        _ready = asyncio.Queue()
+    while len(_workers) < WORKERS:
+        _workers.append(asyncio.create_task(_worker()))
+
+async def stop_workers():
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+def submit(message_id, job):
+    """Queue `async job()`; jobs for one message run in order, other messages run in parallel.
+
+    Returns a future that resolves to True once the job has run, or False if it raised.
+    """
+    jobs = _jobs.get(message_id)
+    if jobs is None:
+        jobs = _jobs[message_id] = deque()
+        _ready.put_nowait(message_id)
+    done = asyncio.get_running_loop().create_future()
+    jobs.append((time.monotonic(), job, done))
+    return done
+
+def is_busy(message_id):
+    """True while an update for the message is waiting to flush or being processed"""
+    return message_id in pending or message_id in _jobs
+
+def queue_depth():
+    """Return (messages with work, jobs waiting or running)"""
+    return len(_jobs), sum(len(jobs) for jobs in _jobs.values())
+
+async def _worker():
+    while True:
+        message_id = await _ready.get()
+        jobs = _jobs[message_id]
+        # Keep the message until its queue is empty so nothing else runs it concurrently
+        while jobs:
+            enqueued_at, job, done = jobs.popleft()
+            started = time.monotonic()
+            ok = True
+            try:
+                await job()
+            except Exception:
+                ok = False
+                queue_stats["errors"] += 1
+                log.exception("event=starboard_job_failed message_id=%s", message_id)
+            # Nobody may be waiting any more, e.g. a cancelled backfill
+            if not done.done():
+                done.set_result(ok)
+            finished = time.monotonic()
+            queue_stats["processed"] += 1
+            queue_stats["wait_total"] += started - enqueued_at
+            queue_stats["run_total"] += finished - started
+            queue_stats["max_run"] = max(queue_stats["max_run"], finished - started)
+        del _jobs[message_id]
+        _ready.task_done()
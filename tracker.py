@@ -0,0 +1,106 @@
+import json
+import logging
+import time
+from discord.ext import tasks
+import database
+import names
+import notifier
+import pbs
+import srcom
+from cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+# === Configuration ===
+# One tracked runner is refreshed per tick, so this caps background PB traffic at two requests a minute
+REFRESH_TICK = 30
+REFRESH_INTERVAL = 15 * 60  # how often each tracked runner is refreshed
+SNAPSHOT_MAX_AGE = 20 * 60  # snapshots younger than this answer /pbs and friends without a request
+# A runner whose refresh fails waits REFRESH_INTERVAL, then twice as long per further failure, up to a day
+REFRESH_BACKOFF_MAX = 24 * 60 * 60
+
+# === Global Variables ===
+# Lower-cased user name -> (user_id, user_name, fetched_at, PlayerPBs)
+snapshot_cache = TTLCache(maxsize=256, ttl=SNAPSHOT_MAX_AGE)
+
+async def start():
+    if not refresh_loop.is_running():
+        refresh_loop.start()
+
+# === Tracking ===
+async def track(player_name, channel_id):
+    """Start announcing new PBs of a runner in a channel; returns their international name or None"""
+    user = await srcom.lookup_user(player_name)
+    if user is None:
+        return None
+    user_id, user_name = user
+    await database.add_tracked_runner(user_id, channel_id, user_name)
+    return user_name
+
+async def untrack(player_name, channel_id):
+    user = await srcom.lookup_user(player_name)
+    if user is None:
+        return False
+    return await database.remove_tracked_runner(user[0], channel_id) > 0
+
+# === Snapshots ===
+async def get_player_pbs(player_name):
+    """Like srcom.fetch_player_pbs, but answered from a fresh local snapshot when there is one"""
+    key = player_name.lower()
+    cached = snapshot_cache.get(key)
+    if cached is None:
+        row = await database.get_pb_snapshot_by_name(player_name)
+        if row and time.time() - row[2] < SNAPSHOT_MAX_AGE:
+            user_id, user_name, fetched_at, records = row
+            cached = (user_id, user_name, fetched_at, pbs.from_rows(json.loads(records)))
+            snapshot_cache.set(key, cached, ttl=SNAPSHOT_MAX_AGE - (time.time() - fetched_at))
+    if cached is not None:
+        return {"user_name": cached[1], "pbs": None, "records": cached[3]}, None
+    data, error = await srcom.fetch_player_pbs(player_name)
+    if data is not None:
+        names.add_records(data["records"].records)
+    return data, error
+
+async def refresh(user_id, user_name):
+    """Fetch a runner's PBs, store the new snapshot and announce anything that improved"""
+    try:
+        _, records = await srcom.fetch_user_pbs(user_id, priority=srcom.PRIORITY_BACKGROUND)
+    except srcom.FETCH_ERRORS as e:
+        log.warning("event=pb_refresh_failed user=%s error=%r", user_name, e)
+        # Otherwise the runner stays the stalest and is retried every tick, ahead of everyone else
+        await database.add_refresh_failure(user_id, REFRESH_INTERVAL, REFRESH_BACKOFF_MAX)
+        return
+    previous = await database.get_pb_snapshot(user_id)
+    fetched_at = time.time()
+    await database.set_pb_snapshot(user_id, user_name, fetched_at, json.dumps([record.to_row() for record in records.records], separators=(",", ":")))
+    snapshot_cache.set(user_name.lower(), (user_id, user_name, fetched_at, records))
+    names.add_records(records.records)
+    if previous is None:
+        # The first snapshot is only a baseline
+        return
+    improved = pbs.diff(pbs.from_rows(json.loads(previous[2])), records)
+    if improved:
+        await announce(user_id, user_name, improved)
+
+async def announce(user_id, user_name, improved):
+    lines = []
+    for record, before in improved:
+        level = f" {record.level}" if record.level else ""
+        was = f", was {before.time}" if before is not None else ""
+        lines.append(f"**{record.game} - {record.category}{level}**: {record.place_emoji} {record.time}{was} ([Link]({record.link}))")
+    content = f"🏃 **New PB{'s' if len(lines) > 1 else ''} for {user_name}!**\n" + "\n".join(lines)
+    for tracked_user_id, channel_id, _ in await database.get_tracked_runners():
+        if tracked_user_id == user_id:
+            await notifier.send(channel_id, content[:2000])
+
+@tasks.loop(seconds=REFRESH_TICK)
+async def refresh_loop():
+    runner = await database.get_stalest_tracked_runner(time.time() - REFRESH_INTERVAL)
+    if not runner:
+        return
+    try:
+        await refresh(*runner)
+    except Exception:
+        # An exception escaping a tasks.loop ends it for every tracked runner
+        log.exception("event=pb_refresh_crashed user=%s", runner[1])
+        await database.add_refresh_failure(runner[0], REFRESH_INTERVAL, REFRESH_BACKOFF_MAX)
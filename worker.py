@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import os
+from discord.ext import tasks
+from dotenv import load_dotenv
+import database
+import metrics
+import poller
+import srcom
+import tracker
+
+# Polls speedrun.com and refreshes tracked PBs without a gateway connection. Announcements are written to the
+# database outbox and sent by the bot, which must run with POLLER_MODE=worker against the same database file.
+
+# === Configuration ===
+load_dotenv()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9109"))  # 0 disables the /metrics endpoint
+WATCH_RELOAD_INTERVAL = 60  # seconds until /watch and /unwatch changes made by the bot are picked up
+STATUS_INTERVAL = 15  # seconds between poll status updates for the bot's /watchlist
+
+log = logging.getLogger("appel_worker")
+
+@tasks.loop(seconds=WATCH_RELOAD_INTERVAL)
+async def reload_watches():
+    await poller.load_watches()
+
+@tasks.loop(seconds=STATUS_INTERVAL)
+async def publish_status():
+    await poller.publish_status()
+
+async def run():
+    await database.create_tables()
+    if METRICS_PORT:
+        await metrics.start_server(METRICS_HOST, METRICS_PORT)
+    await poller.start()
+    await tracker.start()
+    reload_watches.start()
+    publish_status.start()
+    log.info("event=worker_started games=%d", len(poller.watches))
+    try:
+        # The loops run until the process is stopped
+        await asyncio.Event().wait()
+    finally:
+        reload_watches.cancel()
+        publish_status.cancel()
+        poller.scheduler.cancel()
+        tracker.refresh_loop.cancel()
+        await srcom.close_session()
+        await metrics.stop_server()
+        await database.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s level=%(levelname)s logger=%(name)s %(message)s")
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass